@@ -0,0 +1,140 @@
+from datetime import datetime
+from hashlib import md5
+from typing import Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from recipes.models import (CatalogueVersion, Recipe, ShoppingCart,
+                            ShoppingCartVersion, User)
+from rest_framework.request import Request
+
+# Время хранения готовых файлов списка покупок.
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Время хранения общих для всех пользователей фрагментов рецептов.
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Как долго процесс не перечитывает версию справочника из базы, в секундах.
+CATALOGUE_VERSION_TIMEOUT = 1
+
+
+def get_shopping_cart_version(user_id: int) -> int:
+    """Версия списка покупок пользователя.
+
+    Хранится в базе, поэтому изменение списка в любом процессе
+    сразу меняет ключи файлов и ETag во всех остальных. Чтение
+    ничего не пишет: без строки версии список еще не менялся.
+    """
+    version = ShoppingCartVersion.objects.filter(
+        user_id=user_id
+    ).values_list('version', flat=True).first()
+    return version or 0
+
+
+def invalidate_shopping_carts(user_ids: Iterable[int]) -> None:
+    """Увеличение версии списков покупок пользователей.
+
+    Недостающие строки версий создаются с нулевой версией,
+    затем версии всех пользователей увеличиваются одним запросом.
+    """
+    ShoppingCartVersion.objects.bulk_create(
+        [
+            ShoppingCartVersion(user_id=user_id)
+            for user_id in User.objects.filter(
+                id__in=user_ids, shopping_cart_version__isnull=True
+            ).values_list('id', flat=True)
+        ],
+        ignore_conflicts=True
+    )
+    ShoppingCartVersion.objects.filter(user_id__in=user_ids).update(
+        version=F('version') + 1
+    )
+
+
+def invalidate_recipe_shopping_carts(recipe_ids: Iterable[int]) -> None:
+    """Сброс списков покупок, в которых есть рецепты."""
+    invalidate_shopping_carts(
+        ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('user_id')
+    )
+
+
+def touch_recipes(recipe_ids: Iterable[int]) -> None:
+    """Обновление даты изменения рецептов для условных запросов."""
+    Recipe.objects.filter(id__in=recipe_ids).update(updated=timezone.now())
+
+
+def shopping_cart_file_key(user_id: int, format: str) -> str:
+    return (
+        f'shopping_cart:{user_id}:{format}:'
+        f'{get_shopping_cart_version(user_id)}'
+    )
+
+
+def shopping_cart_etag(request: Request, *args, **kwargs) -> Optional[str]:
+    """ETag файла списка покупок для условных запросов."""
+    if request.user.is_anonymous:
+        return None
+    format = request.GET.get('format', 'txt')
+    version = get_shopping_cart_version(request.user.id)
+    return f'{request.user.id}-{format}-{version}'
+
+
+def recipe_fragment_key(recipe: Recipe, context: str) -> str:
+    """Ключ общего фрагмента рецепта.
+
+    В ключ входят дата изменения рецепта и данные автора, поэтому
+    после правки рецепта старый фрагмент больше не читается.
+    """
+    author = recipe.author
+    signature = md5(repr((
+        recipe.updated.isoformat(), author.username, author.email,
+        author.first_name, author.last_name, context
+    )).encode()).hexdigest()
+    return f'recipe_fragment:{recipe.id}:{signature}'
+
+
+def catalogue_version_key(name: str) -> str:
+    return f'catalogue_version:{name}'
+
+
+def get_catalogue_version(name: str) -> CatalogueVersion:
+    """Версия справочника (ингредиентов, тегов).
+
+    Читается из базы и держится в кэше процесса не дольше
+    CATALOGUE_VERSION_TIMEOUT секунд.
+    """
+    key = catalogue_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version, _ = CatalogueVersion.objects.get_or_create(name=name)
+        cache.set(key, version, CATALOGUE_VERSION_TIMEOUT)
+    return version
+
+
+def invalidate_catalogue(name: str) -> None:
+    """Увеличение версии справочника для всех процессов."""
+    updated = CatalogueVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated=timezone.now()
+    )
+    if not updated:
+        CatalogueVersion.objects.get_or_create(
+            name=name, defaults={'version': 1}
+        )
+    cache.delete(catalogue_version_key(name))
+
+
+def catalogue_etag(name: str) -> Callable[..., str]:
+    """Функция ETag для условных запросов к справочнику."""
+    def etag(request: Request, *args, **kwargs) -> str:
+        return f'{name}-{get_catalogue_version(name).version}'
+    return etag
+
+
+def catalogue_last_modified(name: str) -> Callable[..., datetime]:
+    """Функция Last-Modified для условных запросов к справочнику."""
+    def last_modified(request: Request, *args, **kwargs) -> datetime:
+        return get_catalogue_version(name).updated
+    return last_modified
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from typing import Optional, Type
+
+from django.db.models import Count, F, Model, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, ShoppingCart, User
+from users.models import Subscription
+
+# Счетчики: модель, поле счетчика, модель связи и ее поле на модель.
+COUNTERS = [
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'subscribers_count', Subscription, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+]
+
+# За какой период считаются добавления для сортировки trending.
+TRENDING_WINDOW = timedelta(days=7)
+
+
+def counted(
+    related_model: Type[Model], field: str, condition: Optional[Q] = None
+) -> Coalesce:
+    """Подзапрос с фактическим числом связанных записей."""
+    return Coalesce(
+        Subquery(
+            related_model._base_manager.filter(
+                condition or Q(), **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def decremented(field: str, amount: int = 1) -> Greatest:
+    """Уменьшенное значение счетчика, не ниже нуля.
+
+    Разошедшийся с данными счетчик не нарушает ограничение
+    положительного поля.
+    """
+    return Greatest(F(field) - amount, 0)
+
+
+def reconcile_counter(
+    model: Type[Model], counter: str,
+    related_model: Type[Model], field: str
+) -> int:
+    """Исправление расходящихся значений счетчика.
+
+    Возвращает число исправленных строк.
+    """
+    expected = counted(related_model, field)
+    return model._base_manager.exclude(
+        **{counter: expected}
+    ).update(**{counter: expected})
+
+
+def trending_since() -> datetime:
+    """Начало периода для сортировки trending."""
+    return timezone.now() - TRENDING_WINDOW
+
+
+def bump_trending(recipe_id: int, delta: int) -> None:
+    """Изменение рейтинга рецепта при добавлении или удалении."""
+    Recipe.objects.filter(id=recipe_id).update(
+        trending=Greatest(F('trending') + delta, 0)
+    )
+
+
+def refresh_trending() -> int:
+    """Пересчет рейтингов по добавлениям за TRENDING_WINDOW.
+
+    Пересчитываются только рецепты с добавлениями за период
+    и рецепты с ненулевым рейтингом. Возвращает число изменившихся
+    рейтингов.
+    """
+    recent = Q(created__gte=trending_since())
+    active = Q(
+        id__in=Favorite.objects.filter(recent).values('recipe_id')
+    ) | Q(
+        id__in=ShoppingCart.objects.filter(recent).values('recipe_id')
+    ) | Q(trending__gt=0)
+    expected = (
+        counted(Favorite, 'recipe', recent)
+        + counted(ShoppingCart, 'recipe', recent)
+    )
+    return Recipe.objects.filter(active).exclude(trending=expected).update(
+        trending=expected
+    )
@@ -0,0 +1,124 @@
+import logging
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+from uuid import uuid4
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import ShoppingCartExport, User
+
+from .cache import get_shopping_cart_version
+from .generator import SPOOL_MAX_SIZE, ShoppingCartFileGenerator
+
+logger = logging.getLogger(__name__)
+
+# Через сколько задание в работе считается брошенным обработчиком.
+EXPORT_TIMEOUT = timedelta(minutes=10)
+
+# Сколько раз задание берется в работу, прежде чем считается ошибочным.
+EXPORT_MAX_ATTEMPTS = 3
+
+# Сколько хранятся выгрузки и их файлы.
+EXPORT_RETENTION = timedelta(days=1)
+
+# Ошибка для пользователя, подробности пишутся в журнал.
+EXPORT_ERROR_MESSAGE = 'Не удалось сформировать файл.'
+
+
+def create_export(user: User, format: str) -> ShoppingCartExport:
+    """Постановка выгрузки в очередь.
+
+    Если для текущей версии списка покупок уже есть задание,
+    новое не создается.
+    """
+    version = get_shopping_cart_version(user.id)
+    export = ShoppingCartExport.objects.filter(
+        user=user, format=format, version=version
+    ).exclude(status=ShoppingCartExport.FAILED).first()
+    if export is None:
+        export = ShoppingCartExport.objects.create(
+            user=user, format=format, version=version
+        )
+    return export
+
+
+def claim_export() -> Optional[ShoppingCartExport]:
+    """Захват следующего задания из очереди."""
+    with transaction.atomic():
+        export = ShoppingCartExport.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            status=ShoppingCartExport.PENDING
+        ).order_by('created').first()
+        if export is not None:
+            export.status = ShoppingCartExport.RUNNING
+            export.started = timezone.now()
+            export.attempts += 1
+            export.save(update_fields=['status', 'started', 'attempts'])
+    return export
+
+
+def reclaim_stale_exports() -> int:
+    """Возврат в очередь заданий, брошенных упавшим обработчиком.
+
+    Задания, исчерпавшие EXPORT_MAX_ATTEMPTS попыток, помечаются
+    ошибочными. Возвращает число затронутых заданий.
+    """
+    stale = ShoppingCartExport.objects.filter(
+        status=ShoppingCartExport.RUNNING,
+        started__lt=timezone.now() - EXPORT_TIMEOUT
+    )
+    failed = stale.filter(attempts__gte=EXPORT_MAX_ATTEMPTS).update(
+        status=ShoppingCartExport.FAILED,
+        error='Превышено время формирования файла.'
+    )
+    return failed + stale.update(status=ShoppingCartExport.PENDING)
+
+
+def delete_expired_exports() -> int:
+    """Удаление старых выгрузок вместе с файлами.
+
+    Возвращает число удаленных выгрузок.
+    """
+    expired = ShoppingCartExport.objects.filter(
+        created__lt=timezone.now() - EXPORT_RETENTION
+    ).exclude(status=ShoppingCartExport.RUNNING)
+    deleted = 0
+    for export in expired.iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        deleted += 1
+    return deleted
+
+
+def render_export(export: ShoppingCartExport) -> None:
+    """Формирование файла выгрузки в хранилище media.
+
+    Результат записывается, только если задание все еще принадлежит
+    этому обработчику, иначе сформированный файл удаляется.
+    """
+    generator = ShoppingCartFileGenerator(export.user)
+    status, error = ShoppingCartExport.DONE, ''
+    try:
+        with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as file:
+            generator.write(export.format, file)
+            file.seek(0)
+            export.file.save(
+                f'{export.user_id}/{uuid4().hex}.{export.format}',
+                File(file),
+                save=False
+            )
+    except Exception:
+        logger.exception('Ошибка формирования выгрузки %s', export.id)
+        status, error = ShoppingCartExport.FAILED, EXPORT_ERROR_MESSAGE
+    updated = ShoppingCartExport.objects.filter(
+        id=export.id,
+        status=ShoppingCartExport.RUNNING,
+        started=export.started,
+    ).update(file=export.file.name or '', status=status, error=error)
+    if not updated and export.file:
+        export.file.delete(save=False)
+    export.status, export.error = status, error
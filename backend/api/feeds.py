@@ -0,0 +1,126 @@
+from typing import List, Set
+
+from django.db.models import QuerySet
+from recipes.models import FeedEntry, Recipe, User
+from users.models import Subscription
+
+from .counters import counted
+
+# С какого числа подписок лента пользователя хранится готовой.
+FEED_MATERIALIZE_THRESHOLD = 100
+
+# Сколько последних рецептов попадает в ленту при ее пересборке.
+FEED_BACKFILL_SIZE = 1000
+
+# Сколько последних рецептов автора добавляется при подписке.
+FEED_AUTHOR_BACKFILL_SIZE = 50
+
+
+def is_materialized(follows: int) -> bool:
+    """Хранится ли лента пользователя с таким числом подписок."""
+    return follows >= FEED_MATERIALIZE_THRESHOLD
+
+
+def feed_queryset(queryset: QuerySet, authors: Set[int]) -> QuerySet:
+    """Рецепты авторов, на которых подписан пользователь.
+
+    Используется для небольшого числа подписок, рецепты выбираются
+    по индексу (author, -pub_date).
+    """
+    return queryset.filter(author_id__in=authors)
+
+
+def materialized_feed(queryset: QuerySet, user: User) -> QuerySet:
+    """Записи готовой ленты пользователя.
+
+    Записи выводятся по индексу (user, -pub_date, -recipe), фильтры
+    рецептов из queryset добавляются подзапросом, только если заданы.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if queryset.query.has_filters():
+        entries = entries.filter(
+            recipe__in=queryset.order_by().values('id')
+        )
+    return entries
+
+
+def feed_recipes(
+    queryset: QuerySet, entries: List[FeedEntry]
+) -> List[Recipe]:
+    """Рецепты страницы готовой ленты в порядке записей."""
+    recipes = queryset.order_by().in_bulk(
+        [entry.recipe_id for entry in entries]
+    )
+    return [
+        recipes[entry.recipe_id]
+        for entry in entries if entry.recipe_id in recipes
+    ]
+
+
+def feed_entries(user_id: int, recipes: QuerySet) -> List[FeedEntry]:
+    return [
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes.values_list('id', 'pub_date')
+    ]
+
+
+def fan_out_recipe(recipe: Recipe) -> None:
+    """Добавление нового рецепта в готовые ленты подписчиков автора."""
+    users = User.objects.filter(
+        subscriber__author_id=recipe.author_id
+    ).alias(
+        follows=counted(Subscription, 'user')
+    ).filter(
+        follows__gte=FEED_MATERIALIZE_THRESHOLD
+    ).values_list('id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe.id,
+                pub_date=recipe.pub_date
+            )
+            for user_id in users
+        ],
+        ignore_conflicts=True
+    )
+
+
+def rebuild_feed(user_id: int) -> None:
+    """Пересборка готовой ленты пользователя или ее удаление."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    authors = list(Subscription.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True))
+    if not is_materialized(len(authors)):
+        return
+    FeedEntry.objects.bulk_create(feed_entries(
+        user_id,
+        Recipe.objects.filter(
+            author_id__in=authors
+        ).order_by('-pub_date', '-id')[:FEED_BACKFILL_SIZE]
+    ))
+
+
+def follow_changed(user_id: int, author_id: int, followed: bool) -> None:
+    """Обновление готовой ленты после подписки или отписки."""
+    follows = Subscription.objects.filter(user_id=user_id).count()
+    if not is_materialized(follows):
+        if is_materialized(follows + 1) and not followed:
+            FeedEntry.objects.filter(user_id=user_id).delete()
+        return
+    if followed and is_materialized(follows - 1):
+        FeedEntry.objects.bulk_create(
+            feed_entries(
+                user_id,
+                Recipe.objects.filter(
+                    author_id=author_id
+                ).order_by('-pub_date', '-id')[:FEED_AUTHOR_BACKFILL_SIZE]
+            ),
+            ignore_conflicts=True
+        )
+    elif followed:
+        rebuild_feed(user_id)
+    else:
+        FeedEntry.objects.filter(
+            user_id=user_id, recipe__author_id=author_id
+        ).delete()
@@ -0,0 +1,100 @@
+import base64
+import binascii
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Optional
+
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from recipes.models import Recipe, RecipeImageRendition
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import Field, FileField
+
+from .generator import SPOOL_MAX_SIZE
+from .images import strip_image
+
+# Наибольший размер картинки после декодирования, в байтах.
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+
+# Размер части base64 при декодировании, кратен четырем.
+DECODE_CHUNK_SIZE = 64 * 1024
+
+# Сколько байт нужно для определения типа файла.
+FILE_TYPE_HEADER_SIZE = 261
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Картинка в base64 с декодированием по частям.
+
+    Файл собирается во временном файле, который держится в памяти
+    только до SPOOL_MAX_SIZE, и его размер ограничен MAX_IMAGE_SIZE.
+    Сохраняется картинка, заново записанная без метаданных.
+    """
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            return super().to_internal_value(base64_data)
+
+        if ';base64,' in base64_data:
+            base64_data = base64_data.split(';base64,', 1)[1]
+        # Переносы строк и пробелы сдвигали бы границы частей по 4 символа.
+        base64_data = ''.join(base64_data.split())
+        if len(base64_data) // 4 * 3 > MAX_IMAGE_SIZE:
+            raise ValidationError('Картинка слишком большая.')
+
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            for start in range(0, len(base64_data), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    base64_data[start:start + DECODE_CHUNK_SIZE]
+                ))
+        except (TypeError, binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+        file.seek(0)
+        name = self.get_file_name(None)
+        extension = self.get_file_extension(
+            name, file.read(FILE_TYPE_HEADER_SIZE)
+        )
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+
+        file.seek(0)
+        try:
+            Image.open(file).verify()
+            file.seek(0)
+            image = strip_image(file, name)
+        except Exception:
+            raise ValidationError(self.error_messages['invalid_image'])
+        finally:
+            file.close()
+        return FileField.to_internal_value(self, image)
+
+
+class RenditionsField(Field):
+    """Адреса уменьшенных копий картинки рецепта.
+
+    Пока копии не готовы, для всех размеров отдается исходная картинка.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe: Recipe) -> Optional[Dict[str, str]]:
+        if not recipe.image:
+            return None
+        renditions = {}
+        if recipe.image_status == Recipe.IMAGE_DONE:
+            renditions = {
+                rendition.size: rendition.file
+                for rendition in recipe.renditions.all()
+            }
+        request = self.context.get('request')
+        urls = {}
+        for size, _ in RecipeImageRendition.SIZES:
+            url = renditions.get(size, recipe.image).url
+            urls[size] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,16 +1,20 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+from .indexes import tag_index
 
 
 class RecipeFilter(FilterSet):
     """Фильтр для рецептов."""
 
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_index.choices,
+        method='filter_tags',
     )
 
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -23,16 +27,29 @@ class RecipeFilter(FilterSet):
             'tags__slug': ['exact', 'in'],
         }
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без дублей строк."""
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=tag_index.ids(value)
+                )
+            )
+        )
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(in_favorited__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(in_shopping__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
 
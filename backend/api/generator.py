@@ -1,101 +1,126 @@
 from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterable, Iterator
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.http import FileResponse, StreamingHttpResponse
 from docx import Document
-from recipes.models import AmountRecipeIngredients
+from recipes.models import User
 from reportlab.pdfgen import canvas
 
+from .cache import SHOPPING_CART_CACHE_TIMEOUT, shopping_cart_file_key
+from .shopping_list import shopping_cart_ingredients, shopping_cart_recipes
+
+# Размер буфера в памяти, после которого файл выгрузки пишется на диск.
+SPOOL_MAX_SIZE = 1024 * 1024
+
 
 class ShoppingCartFileGenerator:
-    """Класс генерации списка покупок в форматах pdf, txt, doc."""
+    """Класс генерации списка покупок в форматах pdf, txt, doc.
 
-    def __init__(self, request):
-        self.request = request
-        self.user = request.user
-        self.recipe_names = self.get_recipe_name()
+    txt отдается потоком, готовые pdf и doc хранятся в кэше
+    до изменения списка покупок.
+    """
+
+    def __init__(self, user: User):
+        self.user = user
         self.filename = f'{self.user.username}_ingredient_list'
 
-    def get_recipe_name(self):
-        recipes = AmountRecipeIngredients.objects.filter(
-            recipe__in_shopping__user=self.user
-        ).values('recipe__name').distinct()
-        return [recipe_info['recipe__name'] for recipe_info in recipes]
+    def create_shopping_cart_list(self) -> Iterator[str]:
+        """Создание списка покупок.
 
-    def create_shopping_cart_list(self):
-        """Создание списка покупок."""
+        Ингредиенты читаются из базы по мере отдачи строк.
+        """
         recipe_names = [
-            f'"{recipe_name}"' for recipe_name in self.recipe_names
+            f'"{recipe_name}"'
+            for recipe_name in shopping_cart_recipes(self.user)
         ]
         recipe_names_str = ", ".join(recipe_names)
-        shopping_cart = [
+        yield (
             f'Список ингредиентов для '
             f'"{self.user.first_name} {self.user.last_name}"\n'
             f'Готовим {recipe_names_str}\n'
             f'Для этого понадобятся:\n'
-        ]
-        ingredient = (
-            AmountRecipeIngredients.objects.filter(
-                recipe__in_shopping__user=self.user
-            ).values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            ).annotate(amount=Sum('amount'))
         )
-        for ingredients in ingredient:
-            shopping_cart.append(
-                f'{ingredients["ingredient__name"]}: '
-                f'{ingredients["amount"]} '
-                f'{ingredients["ingredient__measurement_unit"]}'
+        for ingredient in shopping_cart_ingredients(self.user):
+            yield (
+                f'{ingredient["name"]}: '
+                f'{ingredient["amount"]} '
+                f'{ingredient["measurement_unit"]}'
             )
-        return shopping_cart
 
-    def generate_pdf(self, shopping_cart) -> HttpResponse:
-        """Генератор формата pdf."""
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer)
+    def cached_file_response(
+        self, shopping_cart: Iterable[str], format: str,
+        write: Callable[[Iterable[str], SpooledTemporaryFile], None]
+    ) -> FileResponse:
+        """Отдача файла из кэша, при промахе файл формируется заново."""
+        key = shopping_cart_file_key(self.user.id, format)
+        content = cache.get(key)
+        if content is None:
+            with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as file:
+                write(shopping_cart, file)
+                file.seek(0)
+                content = file.read()
+            cache.set(key, content, SHOPPING_CART_CACHE_TIMEOUT)
+        return FileResponse(
+            BytesIO(content), as_attachment=True,
+            filename=f'{self.filename}.{format}'
+        )
+
+    def write_pdf(self, shopping_cart: Iterable[str], file) -> None:
+        """Запись списка покупок в pdf."""
+        p = canvas.Canvas(file)
 
         for shopping_c in shopping_cart:
             p.drawString(100, p._y, shopping_c)
             p.showPage()
 
         p.save()
-        buffer.seek(0)
-        format = 'pdf'
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            f'attachment; {self.filename}.{format}'
-        )
-        response.write(buffer.getvalue())
 
-        return response
+    def write_doc(self, shopping_cart: Iterable[str], file) -> None:
+        """Запись списка покупок в doc."""
+        document = Document()
+        for shopping_c in shopping_cart:
+            document.add_paragraph(shopping_c)
+        document.save(file)
 
-    def generate_txt(self, shopping_cart) -> HttpResponse:
+    def write_txt(self, shopping_cart: Iterable[str], file) -> None:
+        """Запись списка покупок в txt."""
+        for shopping_c in shopping_cart:
+            file.write(f'{shopping_c}\n'.encode('utf-8'))
+
+    def write(self, format: str, file) -> None:
+        """Запись списка покупок в файл выбранного формата."""
+        format_to_method = {
+            'pdf': self.write_pdf,
+            'doc': self.write_doc,
+            'txt': self.write_txt,
+        }
+        format_to_method[format](self.create_shopping_cart_list(), file)
+
+    def generate_pdf(self, shopping_cart: Iterable[str]) -> FileResponse:
+        """Генератор формата pdf."""
+        return self.cached_file_response(shopping_cart, 'pdf', self.write_pdf)
+
+    def generate_txt(
+        self, shopping_cart: Iterable[str]
+    ) -> StreamingHttpResponse:
         """Генератор формата txt."""
-        content = '\n'.join(shopping_cart)
         format = 'txt'
-        response = HttpResponse(content_type='text/plain')
+        response = StreamingHttpResponse(
+            (f'{shopping_c}\n'.encode('utf-8')
+             for shopping_c in shopping_cart),
+            content_type='text/plain; charset=utf-8'
+        )
         response['Content-Disposition'] = (
-            f'attachment; {self.filename}.{format}'
+            f'attachment; filename="{self.filename}.{format}"'
         )
-        response.write(content.encode('utf-8'))
-
         return response
 
-    def generate_doc(self, shopping_cart) -> HttpResponse:
+    def generate_doc(self, shopping_cart: Iterable[str]) -> FileResponse:
         """Генератор формата doc."""
-        document = Document()
-        for shopping_c in shopping_cart:
-            document.add_paragraph(shopping_c)
-
-        buffer = BytesIO()
-        document.save(buffer)
-        # content_type = 'application/msword'
-        format = 'doc'
-        response = HttpResponse(content_type='application/msword')
-        response['Content-Disposition'] = (
-            f'attachment; {self.filename}.{format}'
+        response = self.cached_file_response(
+            shopping_cart, 'doc', self.write_doc
         )
-        response.write(buffer.getvalue())
-
+        response['Content-Type'] = 'application/msword'
         return response
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import BytesIO
+from typing import IO, Optional
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from recipes.models import Recipe, RecipeImageRendition
+
+# Наибольшая сторона копии картинки для каждого размера, в пикселях.
+RENDITION_SIZES = {
+    RecipeImageRendition.THUMBNAIL: 160,
+    RecipeImageRendition.CARD: 600,
+    RecipeImageRendition.FULL: 1600,
+}
+
+RENDITION_QUALITY = 80
+
+# WebP, если Pillow собран с его поддержкой, иначе JPEG.
+RENDITION_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+RENDITION_EXTENSION = RENDITION_FORMAT.lower().replace('jpeg', 'jpg')
+
+# Через сколько картинка в работе считается брошенной обработчиком.
+IMAGE_TIMEOUT = timedelta(minutes=10)
+
+
+def claim_recipe_image() -> Optional[Recipe]:
+    """Захват следующего рецепта с необработанной картинкой.
+
+    Строка блокируется только на время смены статуса. Картинки,
+    брошенные упавшим обработчиком, берутся снова через IMAGE_TIMEOUT.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            Q(image_status=Recipe.IMAGE_PENDING)
+            | Q(
+                image_status=Recipe.IMAGE_RUNNING,
+                image_claimed__lt=now - IMAGE_TIMEOUT
+            )
+        ).order_by('id').first()
+        if recipe is not None:
+            recipe.image_status = Recipe.IMAGE_RUNNING
+            recipe.image_claimed = now
+            recipe.save(update_fields=['image_status', 'image_claimed'])
+    return recipe
+
+
+def open_image(source: IO[bytes]) -> Image.Image:
+    """Чтение картинки с поворотом по EXIF.
+
+    Для JPEG декодируется сразу уменьшенная копия, поэтому память
+    не зависит от разрешения исходной фотографии.
+    """
+    largest = max(RENDITION_SIZES.values())
+    image = Image.open(source)
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    mode = 'RGBA' if (
+        RENDITION_FORMAT == 'WEBP' and image.mode in ('RGBA', 'LA', 'P')
+    ) else 'RGB'
+    return image.convert(mode)
+
+
+def render_rendition(image: Image.Image, side: int) -> ContentFile:
+    """Уменьшенная копия без метаданных исходного файла."""
+    image = image.copy()
+    image.thumbnail((side, side), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def strip_image(source: IO[bytes], name: str) -> ContentFile:
+    """Исходная картинка для хранения.
+
+    Картинка уменьшается до размера full и сохраняется заново,
+    поэтому EXIF, GPS и другие метаданные в media не попадают.
+    """
+    content = render_rendition(
+        open_image(source), RENDITION_SIZES[RecipeImageRendition.FULL]
+    )
+    content.name = f'{name}.{RENDITION_EXTENSION}'
+    return content
+
+
+def render_recipe_image(recipe: Recipe) -> None:
+    """Формирование копий картинки рецепта всех размеров.
+
+    Прежние файлы не удаляются сразу: они могут быть общими
+    с другими рецептами и удаляются командой collect_media.
+    """
+    with recipe.image.open('rb') as source:
+        image = open_image(source)
+    existing = {
+        rendition.size: rendition for rendition in recipe.renditions.all()
+    }
+    for size, side in RENDITION_SIZES.items():
+        rendition = existing.get(size) or RecipeImageRendition(
+            recipe=recipe, size=size
+        )
+        rendition.file.save(
+            f'{size}.{RENDITION_EXTENSION}', render_rendition(image, side),
+            save=False
+        )
+        rendition.save()
+
+
+def process_recipe_image() -> Optional[str]:
+    """Обработка картинки одного рецепта из очереди.
+
+    Картинка обрабатывается вне транзакции. Статус меняется, только
+    если за это время картинку не заменили и ее не захватил другой
+    обработчик. Возвращает описание результата или None, если очередь
+    пуста.
+    """
+    recipe = claim_recipe_image()
+    if recipe is None:
+        return None
+    try:
+        render_recipe_image(recipe)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        status, result = Recipe.IMAGE_FAILED, f'{recipe}: {error}'
+    else:
+        status, result = Recipe.IMAGE_DONE, f'{recipe}: {RENDITION_FORMAT}'
+    Recipe.objects.filter(
+        id=recipe.id,
+        image=recipe.image.name,
+        image_status=Recipe.IMAGE_RUNNING,
+        image_claimed=recipe.image_claimed,
+    ).update(image_status=status, updated=timezone.now())
+    return result
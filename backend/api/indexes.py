@@ -0,0 +1,123 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Tuple
+
+from recipes.models import Ingredient, Tag
+
+from .cache import get_catalogue_version
+
+# Сколько ингредиентов отдает поиск для автодополнения.
+INGREDIENT_SEARCH_LIMIT = 50
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся отсортированными: совпадения по началу названия
+    ищутся бинарным поиском, совпадения внутри названия — поиском
+    по общей строке всех названий. Индекс перестраивается
+    при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.catalogue = []
+        self.state = ([], [], [], '')
+
+    def refresh(self) -> None:
+        """Перестроение индекса после изменения ингредиентов."""
+        version = get_catalogue_version('ingredients').version
+        if version == self.version:
+            return
+        self.catalogue = list(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+        )
+        rows = sorted(
+            (row['name'].casefold(), row['id'], row)
+            for row in self.catalogue
+        )
+        keys = [key for key, _, _ in rows]
+        items = [row for _, _, row in rows]
+        offsets = []
+        position = 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key) + 1
+        self.state = (keys, items, offsets, '\n'.join(keys))
+        self.version = version
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Весь справочник ингредиентов в порядке id."""
+        self.refresh()
+        return self.catalogue
+
+    def search(
+        self, query: str, limit: int = INGREDIENT_SEARCH_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """Поиск: сначала по началу названия, затем внутри названия.
+
+        Возвращает не больше limit ингредиентов.
+        """
+        self.refresh()
+        keys, items, offsets, text = self.state
+        query = query.casefold().replace('\n', '')
+        if not query:
+            return items[:limit]
+        start = bisect_left(keys, query)
+        end = start
+        while (
+            end < len(keys) and end - start < limit
+            and keys[end].startswith(query)
+        ):
+            end += 1
+        result = items[start:end]
+
+        position = text.find(query)
+        while position != -1 and len(result) < limit:
+            index = bisect_right(offsets, position) - 1
+            if position != offsets[index]:
+                result.append(items[index])
+            if index + 1 == len(offsets):
+                break
+            position = text.find(query, offsets[index + 1])
+        return result
+
+
+ingredient_index = IngredientIndex()
+
+
+class TagIndex:
+    """Справочник тегов в памяти процесса."""
+
+    def __init__(self):
+        self.version = None
+        self.catalogue = []
+        self.slugs = {}
+
+    def refresh(self) -> None:
+        """Перечитывание тегов после их изменения."""
+        version = get_catalogue_version('tags').version
+        if version == self.version:
+            return
+        self.catalogue = list(
+            Tag.objects.values('id', 'name', 'color', 'slug')
+        )
+        self.slugs = {tag['slug']: tag['id'] for tag in self.catalogue}
+        self.version = version
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Все теги в порядке id."""
+        self.refresh()
+        return self.catalogue
+
+    def choices(self) -> List[Tuple[str, str]]:
+        """Допустимые слаги для фильтра."""
+        self.refresh()
+        return [(slug, slug) for slug in self.slugs]
+
+    def ids(self, slugs: Iterable[str]) -> List[int]:
+        """ID тегов по слагам."""
+        self.refresh()
+        return [self.slugs[slug] for slug in slugs if slug in self.slugs]
+
+
+tag_index = TagIndex()
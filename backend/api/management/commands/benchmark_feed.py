@@ -0,0 +1,53 @@
+from time import perf_counter
+
+from api.filters import RecipeFilter
+from api.indexes import tag_index
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+
+class Command(BaseCommand):
+    """Замер запроса ленты рецептов с фильтром по тегам и без него."""
+
+    help = 'Сравнивает время запроса ленты с фильтром по тегам и без него.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Количество повторов каждого замера.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Размер страницы ленты.'
+        )
+        parser.add_argument(
+            '--tags', nargs='*',
+            help='Слаги тегов для фильтра, по умолчанию все теги.'
+        )
+
+    def measure(self, query: QueryDict, repeat: int, limit: int):
+        """Среднее время подсчета и выборки первой страницы, в мс."""
+        queryset = RecipeFilter(data=query).qs
+        started = perf_counter()
+        for _ in range(repeat):
+            count = queryset.count()
+            list(queryset[:limit])
+        elapsed = (perf_counter() - started) / repeat * 1000
+        return count, elapsed
+
+    def handle(self, *args, **options):
+        tags = options['tags']
+        if tags is None:
+            tags = [slug for slug, _ in tag_index.choices()]
+        query = QueryDict(mutable=True)
+        query.setlist('tags', tags)
+        for title, data in (('без тегов', QueryDict()), ('с тегами', query)):
+            count, elapsed = self.measure(
+                data, options['repeat'], options['limit']
+            )
+            self.stdout.write(
+                f'{title}: {count} рецептов, {elapsed:.2f} мс на страницу'
+            )
+        self.stdout.write(
+            f'SQL с тегами: {RecipeFilter(data=query).qs[:1].query}'
+        )
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from recipes.models import MediaFile
+from recipes.storage import content_storage, unreferenced_files
+
+
+class Command(BaseCommand):
+    """Сборка мусора в хранилище media."""
+
+    help = 'Удаляет файлы хранилища, на которые больше нет ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=float, default=24.0,
+            help='Не трогать файлы, загруженные позже, в часах.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов удалять за один запрос.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов будет удалено.'
+        )
+
+    def handle(self, *args, **options):
+        files = unreferenced_files(
+            timezone.now() - timedelta(hours=options['grace'])
+        )
+        if options['dry_run']:
+            total = files.aggregate(count=Count('id'), size=Sum('size'))
+            self.stdout.write(
+                f'Будет удалено файлов: {total["count"]}, '
+                f'байт: {total["size"] or 0}'
+            )
+            return
+
+        count = size = 0
+        while True:
+            ids = list(
+                files.values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            # Ссылки и время использования проверяются еще раз под
+            # блокировкой: параллельная загрузка того же содержимого
+            # могла снова сослаться на файл после выборки.
+            with transaction.atomic():
+                batch = list(
+                    files.select_for_update().filter(id__in=ids)
+                    .values_list('id', 'name', 'size')
+                )
+                MediaFile.objects.filter(
+                    id__in=[file_id for file_id, _, _ in batch]
+                ).delete()
+                for _, name, file_size in batch:
+                    content_storage.delete(name)
+                    size += file_size
+            count += len(batch)
+        self.stdout.write(f'Удалено файлов: {count}, байт: {size}')
@@ -0,0 +1,42 @@
+import time
+
+from api.similar import compute_similar
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    """Пересчет похожих рецептов."""
+
+    help = 'Пересчитывает похожие рецепты по ингредиентам и тегам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=10,
+            help='Сколько похожих рецептов хранить для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько рецептов пересчитывать за одну транзакцию.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Повторять пересчет с этой паузой, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            processed = 0
+            for count in compute_similar(
+                options['top_k'], options['batch_size']
+            ):
+                processed += count
+            self.stdout.write(
+                f'Обработано рецептов: {processed} '
+                f'за {time.monotonic() - started:.1f} с'
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,125 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable, Iterator, List, Tuple
+
+from api.cache import invalidate_catalogue
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient, Tag
+
+DATA_DIR = Path(settings.BASE_DIR) / 'data'
+
+
+def read_csv(path: Path) -> Iterator[Tuple[str, str]]:
+    """Ингредиенты из строк «название,единица» без заголовка."""
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path: Path) -> Iterator[Tuple[str, str]]:
+    """Ингредиенты из списка объектов или из фикстуры loaddata."""
+    with open(path, encoding='utf-8') as file:
+        for item in json.load(file):
+            item = item.get('fields', item)
+            yield item['name'], item['measurement_unit']
+
+
+def read_ingredients(paths: Iterable[Path]) -> Iterator[Ingredient]:
+    """Ингредиенты из всех файлов без повторов."""
+    seen = set()
+    for path in paths:
+        reader = read_json if path.suffix == '.json' else read_csv
+        for name, unit in reader(path):
+            key = name.strip(), unit.strip()
+            if all(key) and key not in seen:
+                seen.add(key)
+                yield Ingredient(name=key[0], measurement_unit=key[1])
+
+
+def batches(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    batch = list(islice(items, size))
+    while batch:
+        yield batch
+        batch = list(islice(items, size))
+
+
+class Command(BaseCommand):
+    """Загрузка справочников ингредиентов и тегов."""
+
+    help = (
+        'Загружает ингредиенты из csv и json и теги из фикстуры. '
+        'Повторный запуск не создает дублей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sources', nargs='*', type=Path,
+            default=[
+                DATA_DIR / 'ingredients.csv', DATA_DIR / 'ingredients.json'
+            ],
+            help='Файлы ингредиентов в формате csv или json.'
+        )
+        parser.add_argument(
+            '--tags', type=Path, default=DATA_DIR / 'tags.json',
+            help='Фикстура тегов.'
+        )
+        parser.add_argument(
+            '--skip-tags', action='store_true',
+            help='Не загружать теги.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять одним запросом.'
+        )
+
+    def load_tags(self, path: Path) -> int:
+        with open(path, encoding='utf-8') as file:
+            tags = [
+                Tag(**{
+                    field: item.get('fields', item)[field]
+                    for field in ('name', 'color', 'slug')
+                })
+                for item in json.load(file)
+            ]
+        Tag.objects.bulk_create(
+            tags, update_conflicts=True, unique_fields=['slug'],
+            update_fields=['name', 'color']
+        )
+        return len(tags)
+
+    def handle(self, *args, **options):
+        paths = list(options['sources'])
+        if not options['skip_tags']:
+            paths.append(options['tags'])
+        for path in paths:
+            if not path.is_file():
+                raise CommandError(f'Файл {path} не найден.')
+        started = perf_counter()
+        before = Ingredient.objects.count()
+        processed = 0
+        with transaction.atomic():
+            for batch in batches(
+                read_ingredients(options['sources']), options['batch_size']
+            ):
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+            tags = 0
+            if not options['skip_tags']:
+                tags = self.load_tags(options['tags'])
+        elapsed = perf_counter() - started
+        invalidate_catalogue('ingredients')
+        if tags:
+            invalidate_catalogue('tags')
+        self.stdout.write(
+            f'Ингредиентов обработано: {processed}, '
+            f'добавлено: {Ingredient.objects.count() - before}, '
+            f'тегов: {tags}. '
+            f'{elapsed:.2f} с, {processed / max(elapsed, 1e-6):.0f} записей/с'
+        )
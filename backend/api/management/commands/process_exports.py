@@ -0,0 +1,54 @@
+import time
+
+from api.exports import (EXPORT_RETENTION, claim_export,
+                         delete_expired_exports, reclaim_stale_exports,
+                         render_export)
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    """Обработчик очереди выгрузок списков покупок."""
+
+    help = 'Формирует файлы списков покупок из очереди заданий.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--cleanup-interval', type=float,
+            default=EXPORT_RETENTION.total_seconds() / 24,
+            help='Пауза между удалениями старых выгрузок, в секундах.'
+        )
+
+    def maintain(self) -> None:
+        """Возврат брошенных заданий и удаление старых выгрузок."""
+        reclaimed = reclaim_stale_exports()
+        if reclaimed:
+            self.stdout.write(f'Брошенных заданий: {reclaimed}')
+        if time.monotonic() >= self.next_cleanup:
+            deleted = delete_expired_exports()
+            if deleted:
+                self.stdout.write(f'Удалено старых выгрузок: {deleted}')
+            self.next_cleanup = time.monotonic() + self.cleanup_interval
+
+    def handle(self, *args, **options):
+        self.cleanup_interval = options['cleanup_interval']
+        self.next_cleanup = time.monotonic()
+        while True:
+            close_old_connections()
+            export = claim_export()
+            if export is not None:
+                render_export(export)
+                self.stdout.write(f'{export}')
+                continue
+            self.maintain()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
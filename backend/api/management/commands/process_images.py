@@ -0,0 +1,32 @@
+import time
+
+from api.images import process_recipe_image
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    """Обработчик очереди картинок рецептов."""
+
+    help = 'Формирует уменьшенные копии загруженных картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            result = process_recipe_image()
+            if result is not None:
+                self.stdout.write(result)
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
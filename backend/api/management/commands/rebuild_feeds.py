@@ -0,0 +1,28 @@
+from api.feeds import FEED_MATERIALIZE_THRESHOLD, rebuild_feed
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from recipes.models import FeedEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    """Пересборка готовых лент подписок."""
+
+    help = 'Пересобирает ленты пользователей с большим числом подписок.'
+
+    def handle(self, *args, **options):
+        users = set(
+            Subscription.objects.values('user_id').annotate(
+                follows=Count('id')
+            ).filter(
+                follows__gte=FEED_MATERIALIZE_THRESHOLD
+            ).values_list('user_id', flat=True)
+        )
+        stale = FeedEntry.objects.exclude(user_id__in=users)
+        deleted, _ = stale.delete()
+        for user_id in users:
+            rebuild_feed(user_id)
+        self.stdout.write(
+            f'Пересобрано лент: {len(users)}, '
+            f'удалено лишних записей: {deleted}'
+        )
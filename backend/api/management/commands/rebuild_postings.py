@@ -0,0 +1,11 @@
+from api.matching import rebuild_postings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Пересборка обратного индекса ингредиентов."""
+
+    help = 'Пересобирает индекс рецептов по ингредиентам.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Строк в индексе: {rebuild_postings()}')
@@ -0,0 +1,15 @@
+from api.counters import COUNTERS, reconcile_counter
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Сверка счетчиков с фактическими данными."""
+
+    help = 'Пересчитывает счетчики избранного, покупок и подписок.'
+
+    def handle(self, *args, **options):
+        for model, counter, related_model, field in COUNTERS:
+            fixed = reconcile_counter(model, counter, related_model, field)
+            self.stdout.write(
+                f'{model._meta.model_name}.{counter}: исправлено {fixed}'
+            )
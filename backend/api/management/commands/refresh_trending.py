@@ -0,0 +1,26 @@
+import time
+
+from api.counters import refresh_trending
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    """Пересчет рейтингов для сортировки trending."""
+
+    help = 'Пересчитывает рейтинги рецептов за последнее время.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Повторять пересчет с этой паузой, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            changed = refresh_trending()
+            self.stdout.write(f'Изменено рейтингов: {changed}')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, FloatField, Max
+from django.db.models.functions import Cast
+from recipes.models import AmountRecipeIngredients, IngredientPosting
+
+# Сколько лучших рецептов возвращает подбор по ингредиентам.
+MATCH_RESULTS_LIMIT = 500
+
+
+@transaction.atomic
+def update_postings(
+    recipe_id: int, old_ids: Iterable[int], new_ids: Iterable[int]
+) -> None:
+    """Изменение обратного индекса после правки состава рецепта.
+
+    Меняются только строки этого рецепта, поэтому записи рецептов
+    с общими ингредиентами не ждут друг друга.
+    """
+    old_ids, new_ids = set(old_ids), set(new_ids)
+    postings = IngredientPosting.objects.filter(recipe_id=recipe_id)
+    if old_ids - new_ids:
+        postings.filter(ingredient_id__in=old_ids - new_ids).delete()
+    if len(old_ids) != len(new_ids) and old_ids & new_ids:
+        postings.update(ingredients_count=len(new_ids))
+    IngredientPosting.objects.bulk_create(
+        [
+            IngredientPosting(
+                ingredient_id=ingredient_id, recipe_id=recipe_id,
+                ingredients_count=len(new_ids)
+            )
+            for ingredient_id in new_ids - old_ids
+        ],
+        ignore_conflicts=True
+    )
+
+
+def rebuild_postings(batch_size: int = 1000) -> int:
+    """Полная пересборка обратного индекса.
+
+    Возвращает число строк в индексе.
+    """
+    counts: Dict[int, int] = dict(
+        AmountRecipeIngredients.objects.order_by().values(
+            'recipe_id'
+        ).annotate(count=Count('pk')).values_list('recipe_id', 'count')
+    )
+    with transaction.atomic():
+        IngredientPosting.objects.all().delete()
+        IngredientPosting.objects.bulk_create(
+            (
+                IngredientPosting(
+                    ingredient_id=ingredient_id, recipe_id=recipe_id,
+                    ingredients_count=counts[recipe_id]
+                )
+                for recipe_id, ingredient_id in
+                AmountRecipeIngredients.objects.order_by().values_list(
+                    'recipe_id', 'ingredient_id'
+                ).iterator()
+            ),
+            batch_size=batch_size
+        )
+    return IngredientPosting.objects.count()
+
+
+def match_recipes(
+    ingredient_ids: Iterable[int]
+) -> List[Tuple[int, float]]:
+    """Рецепты, отсортированные по доле имеющихся ингредиентов.
+
+    Читаются только строки индекса переданных ингредиентов, поэтому
+    затрагиваются лишь рецепты хотя бы с одним из них. Доли считает
+    и сортирует база.
+    """
+    return list(
+        IngredientPosting.objects.filter(
+            ingredient_id__in=set(ingredient_ids)
+        ).values('recipe_id').annotate(
+            hits=Count('pk'),
+            coverage=Cast(Count('pk'), FloatField()) / Max(
+                'ingredients_count'
+            ),
+        ).order_by(
+            '-coverage', '-hits', '-recipe_id'
+        ).values_list('recipe_id', 'coverage')[:MATCH_RESULTS_LIMIT]
+    )
@@ -1,10 +1,20 @@
-from django.db.models import Model
+from hashlib import md5
+from operator import attrgetter
+from typing import Any, Callable, Dict, List
+
+from django.db import transaction
+from django.db.models import F, Model, QuerySet, prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from recipes.models import Recipe, User
 from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.response import Response
 from users.models import Subscription
 
+from .counters import bump_trending, decremented, trending_since
+from .feeds import follow_changed
 from .serializers import RecipeSerializer
 
 
@@ -12,6 +22,7 @@ class RecipeMixin:
     """Миксин добавления / удаления в избранное и список покупок."""
 
     model_class = Model
+    counter_field = ''
 
     def _add_delete_method(self, request, user, pk: int):
         """Метод создания / удаления."""
@@ -24,7 +35,12 @@ class RecipeMixin:
                     status=status.HTTP_400_BAD_REQUEST
                 )
             recipe = get_object_or_404(Recipe, id=pk)
-            self.model_class.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                self.model_class.objects.create(user=user, recipe=recipe)
+                Recipe.objects.filter(id=pk).update(
+                    **{self.counter_field: F(self.counter_field) + 1}
+                )
+                bump_trending(pk, 1)
             serializer = RecipeSerializer(recipe)
             return Response(
                 serializer.data,
@@ -35,8 +51,18 @@ class RecipeMixin:
         recipe = self.model_class.objects.filter(
             user=user, recipe__id=pk
         )
-        if recipe.exists():
-            recipe.delete()
+        with transaction.atomic():
+            recent = recipe.filter(created__gte=trending_since()).count()
+            deleted, _ = recipe.delete()
+            if deleted:
+                Recipe.objects.filter(id=pk).update(
+                    **{self.counter_field: decremented(
+                        self.counter_field, deleted
+                    )}
+                )
+            if recent:
+                bump_trending(pk, -recent)
+        if deleted:
             return Response(
                 {'detail': 'Связь успешно удалена'},
                 status=status.HTTP_204_NO_CONTENT
@@ -62,15 +88,98 @@ class UserMixin:
                     f'Вы уже подписаны на {author}.',
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Subscription.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Subscription.objects.create(user=user, author=author)
+                User.objects.filter(pk=author.pk).update(
+                    subscribers_count=F('subscribers_count') + 1
+                )
+                follow_changed(user.id, author.id, followed=True)
             return Response(
                 f'Вы подписались на {author}.',
                 status=status.HTTP_201_CREATED,
             )
-        get_object_or_404(
-            Subscription, user=user, author=author
-        ).delete()
+        with transaction.atomic():
+            get_object_or_404(
+                Subscription, user=user, author=author
+            ).delete()
+            User.objects.filter(pk=author.pk).update(
+                subscribers_count=decremented('subscribers_count')
+            )
+            follow_changed(user.id, author.id, followed=False)
         return Response(
             f'Вы отписались от {author}',
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+class ConditionalGetMixin:
+    """Миксин условных GET-запросов для списка и детального просмотра.
+
+    ETag строится по полям etag_fields уже выбранных объектов.
+    Last-Modified не отдается: дата изменения не учитывает отметки
+    пользователя и состав страницы. Связи prefetch_lookups подгружаются
+    только для ответа 200, поэтому ответ 304 обходится без них и без
+    сериализации.
+    """
+
+    etag_fields: List[str] = ['id', 'updated']
+    prefetch_lookups: List[Any] = []
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return queryset
+        return queryset.prefetch_related(*self.prefetch_lookups)
+
+    def get_etag_extra(self) -> Any:
+        """Дополнительные данные, от которых зависит ответ."""
+        return None
+
+    def etag_row(self, instance: Model) -> Dict[str, Any]:
+        """Поля объекта, от которых зависит ETag."""
+        return {
+            field: attrgetter(field.replace('__', '.'))(instance)
+            for field in self.etag_fields
+        }
+
+    def conditional_response(
+        self, request: Request, instances: List[Model], extra: Any,
+        handler: Callable[[], Response]
+    ) -> Response:
+        """Ответ 304, если клиент уже получил эту версию данных."""
+        rows = [self.etag_row(instance) for instance in instances]
+        etag = quote_etag(md5(
+            repr((rows, extra, self.get_etag_extra())).encode()
+        ).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        prefetch_related_objects(instances, *self.prefetch_lookups)
+        response = handler()
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        instances = list(queryset) if page is None else page
+        current = getattr(self.paginator, 'page', None)
+        count = (
+            current.paginator.count if hasattr(current, 'paginator') else None
+        )
+
+        def handler() -> Response:
+            data = self.get_serializer(instances, many=True).data
+            if page is None:
+                return Response(data)
+            return self.get_paginated_response(data)
+
+        return self.conditional_response(request, instances, count, handler)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        instance = self.get_object()
+        return self.conditional_response(
+            request, [instance], None,
+            lambda: Response(self.get_serializer(instance).data)
+        )
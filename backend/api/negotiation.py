@@ -0,0 +1,12 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import APISettings
+
+
+class FileFormatContentNegotiation(DefaultContentNegotiation):
+    """Выбор рендерера без параметра format.
+
+    Для скачивания файлов параметр format выбирает формат файла,
+    а не рендерер ответа.
+    """
+
+    settings = APISettings({'URL_FORMAT_OVERRIDE': None})
@@ -1,8 +1,46 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Постраничный вывод по курсору.
+
+    Порядок берется из атрибута cursor_ordering вьюсета.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ['-pub_date', '-id']
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
 
 
 class CustomPagination(PageNumberPagination):
-    """Настройка отображения страницы."""
+    """Настройка отображения страницы.
+
+    С параметром cursor (в том числе пустым) queryset выводится
+    по курсору без подсчета и OFFSET; готовые списки и queryset,
+    для которых вьюсет не задает cursor_ordering, всегда выводятся
+    по номерам страниц.
+    """
 
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            self.cursor_query_param in request.query_params
+            and isinstance(queryset, QuerySet)
+            and getattr(view, 'cursor_ordering', ()) is not None
+        ):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
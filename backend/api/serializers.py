@@ -1,18 +1,29 @@
-from typing import Any, Dict, List
+from functools import cached_property
+from typing import Any, Dict, List, Set
 
-from django.core.exceptions import ValidationError
-from django.db.models import F, QuerySet
+from django.core.cache import cache
+from django.db.models import Manager
 from django.db.transaction import atomic
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (AmountRecipeIngredients, Ingredient, Recipe, Tag,
-                            User)
-from rest_framework.fields import IntegerField, SerializerMethodField
+from recipes.models import (AmountRecipeIngredients, Ingredient, Recipe,
+                            ShoppingCartExport, Tag, User)
+from recipes.storage import content_storage
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import (BooleanField, FloatField, IntegerField,
+                                   ListField, SerializerMethodField)
 from rest_framework.relations import PrimaryKeyRelatedField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (ListSerializer, ModelSerializer,
+                                        ReadOnlyField)
 from users.models import Subscription
 
+from .cache import (RECIPE_FRAGMENT_TIMEOUT, get_catalogue_version,
+                    invalidate_recipe_shopping_carts, recipe_fragment_key)
+from .fields import RenditionsField, StreamingBase64ImageField
+from .matching import update_postings
+from .signals import bulk_recipe_update
+from .utils import get_subscribed_authors
+
 
 class TagSerializer(ModelSerializer):
     """Сериализатор тегов."""
@@ -36,11 +47,12 @@ class RecipeSerializer(ModelSerializer):
     """Сериализатор рецептов."""
 
     image = Base64ImageField()
+    renditions = RenditionsField()
 
     class Meta:
         model = Recipe
         fields = [
-            'id', 'name', 'image',
+            'id', 'name', 'image', 'renditions',
             'cooking_time'
         ]
     read_only_fields = ['__all__']
@@ -49,10 +61,7 @@ class RecipeSerializer(ModelSerializer):
 class AmountRecipeIngredientsSerializer(ModelSerializer):
     """Сериализатор количества ингредиентов."""
 
-    id = PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredient.objects.all()
-    )
+    id = IntegerField(source='ingredient')
     recipe = PrimaryKeyRelatedField(read_only=True)
     amount = IntegerField(write_only=True)
 
@@ -61,6 +70,18 @@ class AmountRecipeIngredientsSerializer(ModelSerializer):
         fields = ['id', 'recipe', 'amount']
 
 
+class AmountRecipeIngredientsReadSerializer(ModelSerializer):
+    """Сериализатор чтения ингредиентов рецепта с количеством."""
+
+    id = ReadOnlyField(source='ingredient.id')
+    name = ReadOnlyField(source='ingredient.name')
+    measurement_unit = ReadOnlyField(source='ingredient.measurement_unit')
+
+    class Meta:
+        model = AmountRecipeIngredients
+        fields = ['id', 'name', 'measurement_unit', 'amount']
+
+
 class CreateCustomUserSerializer(UserCreateSerializer):
     """Создание пользователя."""
 
@@ -100,20 +121,17 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj: User) -> bool:
         """Проверка подписки пользователя."""
-        request_user = self.context.get('request').user
-
-        if request_user.is_anonymous or (request_user == obj):
-            return False
-        return Subscription.objects.filter(
-            user=request_user, author=obj
-        ).exists()
+        request = self.context.get('request')
+        return obj.id in get_subscribed_authors(request)
 
 
 class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор подписок."""
 
-    recipes = RecipeSerializer(read_only=True, many=True)
-    recipes_count = SerializerMethodField()
+    recipes = RecipeSerializer(
+        source='limited_recipes', read_only=True, many=True
+    )
+    recipes_count = IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -142,21 +160,15 @@ class SubscriptionSerializer(CustomUserSerializer):
             raise ValidationError('Действие невозможно!')
         return data
 
-    def get_recipes_count(self, user: User) -> int:
-        """Количесвтво рецептов."""
-        return user.recipes.count()
-
 
 class RecipeCreateSerializer(ModelSerializer):
     """Сериализатор создания рецептов."""
 
     author = CustomUserSerializer(read_only=True)
-    tags = PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = ListField(child=IntegerField())
     ingredients = AmountRecipeIngredientsSerializer(many=True)
 
-    image = Base64ImageField(required=True, allow_null=False)
+    image = StreamingBase64ImageField(required=True, allow_null=False)
 
     class Meta:
         model = Recipe
@@ -166,35 +178,63 @@ class RecipeCreateSerializer(ModelSerializer):
         ]
 
     def validate_ingredient(
-        self, ingredient_item: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Валидатор ингредиентов по отдельности."""
-        ingredient = get_object_or_404(Ingredient, id=ingredient_item['id'])
-        if ingredient.name in self.ingredient_list:
-            raise ValidationError(f'{ingredient.name} уже присутствует.')
-        self.ingredient_list.append(ingredient.name)
-        if int(ingredient_item['amount']) < 1:
-            raise ValidationError('Количество не может быть пустым.')
-        return ingredient_item
-
-    def validate_ingredients(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Валидатор ингредиетов."""
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        self, ingredient_item: Dict[str, Any],
+        ingredients: Dict[int, Ingredient], seen: Set[int]
+    ) -> Dict[str, List[str]]:
+        """Ошибки одной строки ингредиентов."""
+        errors = {}
+        ingredient = ingredients.get(ingredient_item['ingredient'])
+        if ingredient is None:
+            errors['id'] = ['Ингредиент не найден.']
+        elif ingredient.id in seen:
+            errors['id'] = [f'{ingredient.name} уже присутствует.']
+        else:
+            seen.add(ingredient.id)
+            ingredient_item['ingredient'] = ingredient
+        if ingredient_item['amount'] < 1:
+            errors['amount'] = ['Количество не может быть пустым.']
+        return errors
+
+    def validate_ingredients(
+        self, data: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Валидатор ингредиетов.
+
+        Все ингредиенты выбираются одним запросом, ошибки
+        возвращаются по строкам.
+        """
+        if not data:
             raise ValidationError('Нельзя приготовить из ничего.')
 
-        self.ingredient_list = []
-        for ingredient_item in ingredients:
-            self.validate_ingredient(ingredient_item)
+        ingredients = Ingredient.objects.in_bulk(
+            {item['ingredient'] for item in data}
+        )
+        seen = set()
+        errors = [
+            self.validate_ingredient(item, ingredients, seen)
+            for item in data
+        ]
+        if any(errors):
+            raise ValidationError(errors)
         return data
 
-    def validate_tags(self, tags: Tag) -> Tag:
+    def validate_tags(self, data: List[int]) -> List[Tag]:
         """Валидатор тегов."""
-        if not tags:
+        if not data:
             raise ValidationError('Количество не может быть пустым.')
-        if len(tags) != len(set(tags)):
-            raise ValidationError(f'{tags} уже выбран.')
-        return tags
+
+        tags = Tag.objects.in_bulk(set(data))
+        seen = set()
+        errors = {}
+        for index, tag_id in enumerate(data):
+            if tag_id not in tags:
+                errors[index] = [f'Тег {tag_id} не найден.']
+            elif tag_id in seen:
+                errors[index] = [f'{tags[tag_id].name} уже выбран.']
+            seen.add(tag_id)
+        if errors:
+            raise ValidationError(errors)
+        return [tags[tag_id] for tag_id in data]
 
     def ingredients_set(
         self, recipe: Recipe, ingredients: List[Dict[str, Any]]
@@ -220,31 +260,118 @@ class RecipeCreateSerializer(ModelSerializer):
 
         recipe.tags.set(tags)
         self.ingredients_set(recipe, ingredients)
+        update_postings(
+            recipe.id, [], [item['ingredient'].id for item in ingredients]
+        )
 
         return recipe
 
+    def ingredients_update(
+        self, recipe: Recipe, ingredients: List[Dict[str, Any]]
+    ) -> bool:
+        """Обновление ингредиентов по разнице с текущими строками.
+
+        Возвращает True, если состав рецепта изменился.
+        """
+        amounts = {
+            item['ingredient'].id: item['amount'] for item in ingredients
+        }
+        existing = {
+            row.ingredient_id: row
+            for row in AmountRecipeIngredients.objects.filter(recipe=recipe)
+        }
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        created = [
+            AmountRecipeIngredients(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        removed = existing.keys() - amounts.keys()
+
+        if removed:
+            # Кэш сбрасывается один раз в update(), а не по каждой строке.
+            with bulk_recipe_update():
+                AmountRecipeIngredients.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed
+                ).delete()
+        if changed:
+            AmountRecipeIngredients.objects.bulk_update(changed, ['amount'])
+        if created:
+            AmountRecipeIngredients.objects.bulk_create(created)
+        if removed or created:
+            update_postings(recipe.id, existing, amounts)
+        return bool(removed or changed or created)
+
+    def tags_update(self, recipe: Recipe, tags: List[Tag]) -> bool:
+        """Обновление тегов по разнице с текущими связями.
+
+        Возвращает True, если теги рецепта изменились.
+        """
+        through = Recipe.tags.through
+        existing = set(
+            through.objects.filter(recipe=recipe).values_list(
+                'tag_id', flat=True
+            )
+        )
+        tag_ids = {tag.id for tag in tags}
+        removed = existing - tag_ids
+        added = tag_ids - existing
+
+        if removed:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=removed
+            ).delete()
+        if added:
+            through.objects.bulk_create(
+                through(recipe=recipe, tag_id=tag_id) for tag_id in added
+            )
+        return bool(removed or added)
+
     @atomic
     def update(self, recipe: Recipe, validated_data: dict) -> Recipe:
-        """Обновление рецепта."""
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        """Обновление рецепта.
+
+        Меняются только отличающиеся поля и строки; картинка сравнивается
+        по имени в хранилище, то есть по хешу содержимого. Кэш списков
+        покупок сбрасывается, только если изменились название или состав.
+        """
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
 
         update_fields = []
 
         for key, value in validated_data.items():
-            if hasattr(recipe, key):
+            if not hasattr(recipe, key):
+                continue
+            if key == 'image':
+                changed = value is not None and content_storage.content_name(
+                    value.name, value
+                ) != recipe.image.name
+            else:
+                changed = getattr(recipe, key) != value
+            if changed:
                 setattr(recipe, key, value)
                 update_fields.append(key)
+        if 'image' in update_fields:
+            recipe.image_status = Recipe.IMAGE_PENDING
+            update_fields.append('image_status')
 
-        if tags:
-            recipe.tags.clear()
-            recipe.tags.set(tags)
-
-        if ingredients:
-            recipe.ingredients.clear()
-            self.ingredients_set(recipe=recipe, ingredients=ingredients)
+        tags_changed = bool(tags) and self.tags_update(recipe, tags)
+        ingredients_changed = bool(ingredients) and self.ingredients_update(
+            recipe, ingredients
+        )
 
-        recipe.save(update_fields=update_fields)
+        if update_fields or tags_changed or ingredients_changed:
+            recipe.save(update_fields=update_fields + ['updated'])
+        if ingredients_changed:
+            invalidate_recipe_shopping_carts([recipe.id])
         return recipe
 
     def to_representation(self, instance: Recipe) -> dict:
@@ -255,42 +382,124 @@ class RecipeCreateSerializer(ModelSerializer):
         return serializer.data
 
 
+class RecipeReadListSerializer(ListSerializer):
+    """Сериализатор списка рецептов.
+
+    Общие фрагменты всех рецептов страницы читаются из кэша
+    одним запросом.
+    """
+
+    def to_representation(self, data) -> List[Dict[str, Any]]:
+        recipes = data.all() if isinstance(data, Manager) else data
+        recipes = list(recipes)
+        fragments = self.child.get_fragments(recipes)
+        return [
+            self.child.personalize(fragments[recipe.id], recipe)
+            for recipe in recipes
+        ]
+
+
 class RecipeReadSerializer(ModelSerializer):
-    """Сериализатор чтения рецептов."""
+    """Сериализатор чтения рецептов.
+
+    Часть ответа, одинаковая для всех пользователей, кэшируется
+    по версии рецепта; признаки избранного, списка покупок и подписки
+    добавляются при каждом ответе.
+    """
+
+    personal_fields = ['is_favorited', 'is_in_shopping_cart']
 
     author = CustomUserSerializer(read_only=True)
-    ingredients = SerializerMethodField()
+    ingredients = AmountRecipeIngredientsReadSerializer(
+        source='recipe_amount', read_only=True, many=True
+    )
     tags = TagSerializer(read_only=True, many=True)
     image = Base64ImageField()
-    is_favorited = SerializerMethodField(read_only=True)
-    is_in_shopping_cart = SerializerMethodField(read_only=True)
+    renditions = RenditionsField()
+    is_favorited = BooleanField(read_only=True, default=False)
+    is_in_shopping_cart = BooleanField(read_only=True, default=False)
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'name', 'author', 'ingredients',
-            'tags', 'image', 'text', 'cooking_time',
+            'tags', 'image', 'renditions', 'text', 'cooking_time',
             'pub_date', 'is_favorited', 'is_in_shopping_cart'
         ]
-
-    def get_is_favorited(self, recipe: Recipe) -> bool:
-        """Находится ли рецепт в избраном."""
-        user = self.context.get('view').request.user
-        if user.is_authenticated:
-            return user.favorited.filter(recipe=recipe).exists()
-        return False
-
-    def get_is_in_shopping_cart(self, recipe: Recipe) -> bool:
-        """Находится ли рецепт в списке покупок."""
-        user = self.context.get('view').request.user
-        if user.is_authenticated:
-            return user.shopping.filter(recipe=recipe).exists()
-        return False
-
-    def get_ingredients(self, recipe: Recipe) -> QuerySet:
-        """Получение ингредиентов."""
-        ingredients = recipe.ingredients.values(
-            'id', 'name', 'measurement_unit',
-            amount=F('ingredient_amount__amount')
+        list_serializer_class = RecipeReadListSerializer
+
+    @cached_property
+    def fragment_context(self) -> str:
+        """Общие для всех рецептов части ключа фрагмента."""
+        request = self.context.get('request')
+        base_url = request.build_absolute_uri('/') if request else ''
+        return '{}:{}:{}'.format(
+            base_url,
+            get_catalogue_version('tags').version,
+            get_catalogue_version('ingredients').version
         )
-        return ingredients
+
+    def get_fragments(
+        self, recipes: List[Recipe]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Общие фрагменты рецептов из кэша или после сериализации."""
+        keys = {
+            recipe_fragment_key(recipe, self.fragment_context): recipe
+            for recipe in recipes
+        }
+        cached = cache.get_many(keys)
+        missing = {}
+        for key, recipe in keys.items():
+            if key not in cached:
+                missing[key] = self.get_fragment(recipe)
+        if missing:
+            cache.set_many(missing, RECIPE_FRAGMENT_TIMEOUT)
+        cached.update(missing)
+        return {recipe.id: cached[key] for key, recipe in keys.items()}
+
+    def get_fragment(self, recipe: Recipe) -> Dict[str, Any]:
+        """Сериализация рецепта без персональных полей."""
+        data = super().to_representation(recipe)
+        for field in self.personal_fields:
+            data.pop(field)
+        data['author'].pop('is_subscribed')
+        return data
+
+    def personalize(
+        self, fragment: Dict[str, Any], recipe: Recipe
+    ) -> Dict[str, Any]:
+        """Добавление персональных полей к общему фрагменту."""
+        data = dict(fragment)
+        data['author'] = {
+            **fragment['author'],
+            'is_subscribed': recipe.author_id in get_subscribed_authors(
+                self.context.get('request')
+            )
+        }
+        for field in self.personal_fields:
+            data[field] = getattr(recipe, field, False)
+        return data
+
+    def to_representation(self, recipe: Recipe) -> Dict[str, Any]:
+        fragment = self.get_fragments([recipe])[recipe.id]
+        return self.personalize(fragment, recipe)
+
+
+class RecipeMatchSerializer(RecipeReadSerializer):
+    """Сериализатор рецептов, подобранных по ингредиентам."""
+
+    personal_fields = RecipeReadSerializer.personal_fields + ['coverage']
+
+    coverage = FloatField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ['coverage']
+
+
+class ShoppingCartExportSerializer(ModelSerializer):
+    """Сериализатор выгрузок списка покупок."""
+
+    class Meta:
+        model = ShoppingCartExport
+        fields = ['id', 'format', 'status', 'error', 'created']
+        read_only_fields = ['status', 'error', 'created']
@@ -0,0 +1,78 @@
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.db.models import Sum
+from recipes.models import AmountRecipeIngredients, Recipe, User
+
+# Единицы измерения, приводимые к базовой: единица -> (базовая, множитель).
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+}
+
+
+def normalize_amount(amount: int, unit: str) -> Tuple[int, str]:
+    """Перевод количества в базовую единицу измерения."""
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+    return amount * factor, base_unit
+
+
+def display_amount(amount: int, base_unit: str) -> Tuple[int, str]:
+    """Перевод количества в наибольшую единицу без дробной части."""
+    unit, factor = base_unit, 1
+    for candidate, (base, candidate_factor) in UNIT_CONVERSIONS.items():
+        if (
+            base == base_unit
+            and candidate_factor > factor
+            and amount % candidate_factor == 0
+        ):
+            unit, factor = candidate, candidate_factor
+    return amount // factor, unit
+
+
+def shopping_cart_recipes(user: User) -> List[str]:
+    """Названия рецептов в списке покупок пользователя."""
+    return list(
+        Recipe.objects.filter(in_shopping__user=user).order_by(
+            'name'
+        ).values_list('name', flat=True).distinct()
+    )
+
+
+def shopping_cart_ingredients(user: User) -> Iterator[Dict[str, Any]]:
+    """Суммы ингредиентов из списка покупок пользователя.
+
+    Строки сгруппированы в базе и идут по названию ингредиента,
+    поэтому кг и г, л и мл одного ингредиента складываются по мере
+    чтения, без сбора всего списка в памяти.
+    """
+    rows = AmountRecipeIngredients.objects.filter(
+        recipe__in_shopping__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount')).order_by('ingredient__name')
+
+    for name, group in groupby(
+        rows.iterator(), key=itemgetter('ingredient__name')
+    ):
+        totals = {}
+        for row in group:
+            amount, unit = normalize_amount(
+                row['amount'], row['ingredient__measurement_unit']
+            )
+            totals[unit] = totals.get(unit, 0) + amount
+        for base_unit, total in sorted(totals.items()):
+            amount, unit = display_amount(total, base_unit)
+            yield {'name': name, 'measurement_unit': unit, 'amount': amount}
+
+
+def aggregate_shopping_cart(user: User) -> Dict[str, List[Any]]:
+    """Сводный список покупок пользователя."""
+    return {
+        'recipes': shopping_cart_recipes(user),
+        'ingredients': list(shopping_cart_ingredients(user)),
+    }
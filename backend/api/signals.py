@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from threading import local
+from typing import Iterator
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (AmountRecipeIngredients, Ingredient, Recipe,
+                            ShoppingCart, Tag, User)
+
+from .cache import (invalidate_catalogue, invalidate_recipe_shopping_carts,
+                    invalidate_shopping_carts, touch_recipes)
+
+# Флаг массовой правки состава рецепта в текущем потоке.
+bulk_update_state = local()
+
+
+@contextmanager
+def bulk_recipe_update() -> Iterator[None]:
+    """Правка состава рецепта без сброса кэша по каждой строке.
+
+    Кэш и дату изменения рецепта вызывающий код обновляет сам,
+    один раз после правки.
+    """
+    bulk_update_state.active = True
+    try:
+        yield
+    finally:
+        bulk_update_state.active = False
+
+
+def changed_recipe_ids(instance, action: str, reverse: bool, pk_set):
+    """ID рецептов, затронутых изменением связи многие ко многим."""
+    if reverse:
+        if action == 'pre_clear':
+            return list(instance.recipes.values_list('id', flat=True))
+        if action in ('post_add', 'post_remove'):
+            return pk_set
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        return [instance.id]
+    return []
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def shopping_cart_changed(sender, instance: ShoppingCart, **kwargs) -> None:
+    """Добавление или удаление рецепта из списка покупок."""
+    invalidate_shopping_carts([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=AmountRecipeIngredients)
+def recipe_amount_changed(
+    sender, instance: AmountRecipeIngredients, **kwargs
+) -> None:
+    """Изменение ингредиентов рецепта."""
+    if getattr(bulk_update_state, 'active', False):
+        return
+    invalidate_recipe_shopping_carts([instance.recipe_id])
+    touch_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(
+    sender, instance: Recipe, created: bool, update_fields, **kwargs
+) -> None:
+    """Изменение названия рецепта."""
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    invalidate_recipe_shopping_carts([instance.id])
+
+
+@receiver(post_save, sender=User)
+def user_changed(
+    sender, instance: User, created: bool, update_fields, **kwargs
+) -> None:
+    """Изменение имени пользователя в заголовке списка покупок."""
+    if created or (
+        update_fields is not None
+        and not {'first_name', 'last_name'} & set(update_fields)
+    ):
+        return
+    invalidate_shopping_carts([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(
+    sender, instance, action: str, reverse: bool, pk_set, **kwargs
+) -> None:
+    """Изменение ингредиентов рецепта через связь многие ко многим."""
+    recipe_ids = changed_recipe_ids(instance, action, reverse, pk_set)
+    if recipe_ids:
+        invalidate_recipe_shopping_carts(recipe_ids)
+        touch_recipes(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(
+    sender, instance, action: str, reverse: bool, pk_set, **kwargs
+) -> None:
+    """Изменение тегов рецепта."""
+    recipe_ids = changed_recipe_ids(instance, action, reverse, pk_set)
+    if recipe_ids:
+        touch_recipes(recipe_ids)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance: Ingredient, **kwargs) -> None:
+    """Изменение справочника ингредиентов."""
+    invalidate_catalogue('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance: Tag, **kwargs) -> None:
+    """Изменение справочника тегов."""
+    invalidate_catalogue('tags')
@@ -0,0 +1,136 @@
+from heapq import nlargest
+from typing import Dict, FrozenSet, Iterator, List, Set
+
+from django.db import transaction
+from recipes.models import AmountRecipeIngredients, Recipe, SimilarRecipe
+
+# Вклад коэффициентов Жаккара по ингредиентам и по тегам в итоговую
+# оценку.
+INGREDIENT_WEIGHT = 0.8
+TAG_WEIGHT = 0.2
+
+# Ингредиенты, которые есть в большей доле рецептов (соль, вода),
+# но не меньше чем в COMMON_INGREDIENT_MIN рецептах, используются
+# для поиска кандидатов, только если других кандидатов нет,
+# и всегда учитываются в оценке.
+COMMON_INGREDIENT_SHARE = 0.05
+COMMON_INGREDIENT_MIN = 1000
+
+# Сколько похожих рецептов отдает эндпоинт.
+SIMILAR_RESULTS_LIMIT = 20
+
+
+def jaccard(first: FrozenSet[int], second: FrozenSet[int]) -> float:
+    """Коэффициент Жаккара: |A ∩ B| / |A ∪ B|."""
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+class SimilarityModel:
+    """Составы всех рецептов для расчета сходства по Жаккару.
+
+    Кандидаты для рецепта берутся из обратного индекса по его
+    нечастым ингредиентам, поэтому рецепт не сравнивается со всеми.
+    Если таких кандидатов нет, например в рецепте только частые
+    ингредиенты, кандидаты берутся и по частым.
+    """
+
+    def __init__(self) -> None:
+        ingredients: Dict[int, set] = {}
+        for recipe_id, ingredient_id in AmountRecipeIngredients.objects.all(
+        ).order_by().values_list('recipe_id', 'ingredient_id').iterator():
+            ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+        tags: Dict[int, set] = {}
+        for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).iterator():
+            tags.setdefault(recipe_id, set()).add(tag_id)
+
+        self.ingredients = {
+            recipe_id: frozenset(items)
+            for recipe_id, items in ingredients.items()
+        }
+        self.tags = {
+            recipe_id: frozenset(items) for recipe_id, items in tags.items()
+        }
+        postings: Dict[int, List[int]] = {}
+        for recipe_id, items in self.ingredients.items():
+            for ingredient_id in items:
+                postings.setdefault(ingredient_id, []).append(recipe_id)
+        limit = max(
+            COMMON_INGREDIENT_MIN,
+            len(self.ingredients) * COMMON_INGREDIENT_SHARE
+        )
+        self.postings: Dict[int, List[int]] = {}
+        self.common_postings: Dict[int, List[int]] = {}
+        for ingredient_id, recipe_ids in postings.items():
+            target = (
+                self.postings if len(recipe_ids) <= limit
+                else self.common_postings
+            )
+            target[ingredient_id] = recipe_ids
+
+    def candidates(
+        self, recipe_id: int, postings: Dict[int, List[int]]
+    ) -> Set[int]:
+        """Рецепты с общими ингредиентами из postings."""
+        candidates = set()
+        for ingredient_id in self.ingredients.get(recipe_id, ()):
+            candidates.update(postings.get(ingredient_id, ()))
+        candidates.discard(recipe_id)
+        return candidates
+
+    def score(self, recipe_id: int, other_id: int) -> float:
+        empty = frozenset()
+        return (
+            INGREDIENT_WEIGHT * jaccard(
+                self.ingredients.get(recipe_id, empty),
+                self.ingredients.get(other_id, empty)
+            )
+            + TAG_WEIGHT * jaccard(
+                self.tags.get(recipe_id, empty),
+                self.tags.get(other_id, empty)
+            )
+        )
+
+    def neighbours(self, recipe_id: int, top_k: int) -> List[SimilarRecipe]:
+        """Ближайшие рецепты по составу."""
+        candidates = self.candidates(
+            recipe_id, self.postings
+        ) or self.candidates(recipe_id, self.common_postings)
+        scores = {
+            other_id: self.score(recipe_id, other_id)
+            for other_id in candidates
+        }
+        return [
+            SimilarRecipe(
+                recipe_id=recipe_id, similar_id=other_id,
+                score=scores[other_id]
+            )
+            for other_id in nlargest(
+                top_k, scores,
+                key=lambda other_id: (scores[other_id], other_id)
+            )
+        ]
+
+
+def compute_similar(top_k: int, batch_size: int) -> Iterator[int]:
+    """Пересчет похожих рецептов пачками.
+
+    После каждой пачки возвращает число обработанных рецептов.
+    """
+    model = SimilarityModel()
+    recipe_ids = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True
+    ))
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        neighbours = [
+            neighbour
+            for recipe_id in batch
+            for neighbour in model.neighbours(recipe_id, top_k)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(neighbours)
+        yield len(batch)
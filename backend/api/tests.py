@@ -0,0 +1,1260 @@
+import json
+import os
+import shutil
+import tempfile
+from base64 import b64decode, b64encode
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from recipes.models import (AmountRecipeIngredients, Ingredient,
+                            IngredientPosting, MediaFile, Recipe, ShoppingCart,
+                            ShoppingCartExport, ShoppingCartVersion,
+                            SimilarRecipe, Tag, User)
+from recipes.storage import content_storage
+from rest_framework.test import APIClient
+
+from .cache import get_catalogue_version, get_shopping_cart_version
+from .counters import reconcile_counter
+from .exports import (EXPORT_ERROR_MESSAGE, EXPORT_MAX_ATTEMPTS,
+                      EXPORT_RETENTION, EXPORT_TIMEOUT, claim_export,
+                      create_export, delete_expired_exports,
+                      reclaim_stale_exports, render_export)
+from .fields import DECODE_CHUNK_SIZE
+from .generator import ShoppingCartFileGenerator
+from .images import (IMAGE_TIMEOUT, RENDITION_FORMAT, RENDITION_SIZES,
+                     claim_recipe_image, process_recipe_image, strip_image)
+from .indexes import IngredientIndex
+from .similar import INGREDIENT_WEIGHT, TAG_WEIGHT
+from .views import RecipeViewSet
+
+PNG = b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAC'
+    'hwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ApiTestCase(TestCase):
+    """Общие данные тестов: пользователи, теги, ингредиенты, рецепты."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Иван', last_name='Иванов'
+        )
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Петр', last_name='Петров'
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in [
+                ('завтрак', '#FFA500', 'breakfast'),
+                ('обед', '#008B8B', 'dinner'),
+            ]
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ['мука', 'сахар', 'соль', 'яйца']
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, name, ingredients=None, author=None):
+        recipe = Recipe(
+            name=name, author=author or self.author, text='Текст',
+            cooking_time=10
+        )
+        recipe.image.save('recipe.png', ContentFile(PNG), save=False)
+        recipe.save()
+        recipe.tags.set(self.tags)
+        for ingredient in ingredients or self.ingredients[:2]:
+            AmountRecipeIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        return recipe
+
+
+class RecipeListQueriesTest(ApiTestCase):
+    """Число запросов списка рецептов не зависит от числа рецептов."""
+
+    # Подсчет и страница рецептов, подписки, две версии справочников,
+    # теги, копии картинок, ингредиенты.
+    LIST_QUERIES = 8
+
+    def test_list_queries(self):
+        for index in range(2):
+            self.create_recipe(f'Рецепт {index}')
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+        for index in range(2, 6):
+            self.create_recipe(f'Рецепт {index}')
+        cache.clear()
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get('/api/recipes/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        self.assertFalse(results[0]['is_favorited'])
+
+
+class RecipeReadTest(ApiTestCase):
+    """Ингредиенты рецепта и фильтр рецептов по тегам."""
+
+    def test_ingredient_amounts_belong_to_recipe(self):
+        first, second = (
+            self.create_recipe('Рецепт 1'), self.create_recipe('Рецепт 2')
+        )
+        AmountRecipeIngredients.objects.filter(recipe=second).update(
+            amount=5
+        )
+        for recipe, amount in ((first, 1), (second, 5)):
+            ingredients = self.client.get(
+                f'/api/recipes/{recipe.id}/'
+            ).json()['ingredients']
+            self.assertEqual(
+                [ingredient['amount'] for ingredient in ingredients],
+                [amount, amount]
+            )
+
+    def test_tags_filter_without_duplicates(self):
+        self.create_recipe('Рецепт 1')
+        other = self.create_recipe('Рецепт 2')
+        other.tags.set(self.tags[1:])
+        self.create_recipe('Рецепт 3').tags.set(self.tags[:1])
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['breakfast', 'dinner']}
+        )
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 3)
+        response = self.client.get('/api/recipes/', {'tags': 'dinner'})
+        self.assertEqual(
+            {recipe['name'] for recipe in response.json()['results']},
+            {'Рецепт 1', 'Рецепт 2'}
+        )
+
+
+class ConditionalGetTest(ApiTestCase):
+    """ETag и ответ 304 для списка и детального просмотра рецептов."""
+
+    # Подсчет и страница рецептов, подписки, две версии справочников.
+    NOT_MODIFIED_QUERIES = 5
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe('Рецепт')
+
+    def get(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_not_modified(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        cache.clear()
+        with self.assertNumQueries(self.NOT_MODIFIED_QUERIES):
+            response = self.get('/api/recipes/', etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_not_modified(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/recipes/0/').status_code, 404
+        )
+
+    def test_etag_follows_changes(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        response = self.get('/api/recipes/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['is_favorited'])
+
+        etag = response['ETag']
+        self.recipe.refresh_from_db()
+        self.recipe.text = 'Новый текст'
+        self.recipe.save()
+        response = self.get('/api/recipes/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый текст')
+
+        etag = response['ETag']
+        self.author.first_name = 'Павел'
+        self.author.save()
+        response = self.get('/api/recipes/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['author']['first_name'], 'Павел'
+        )
+
+    def test_if_modified_since_is_ignored(self):
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('Last-Modified', response)
+        self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        response = self.client.get(
+            '/api/recipes/', HTTP_IF_MODIFIED_SINCE=http_date()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['is_favorited'])
+
+    def test_cursor_orderings(self):
+        self.create_recipe('Второй рецепт')
+        for ordering in ('popular', 'trending', ''):
+            response = self.client.get(
+                '/api/recipes/', {'cursor': '', 'ordering': ordering}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 2)
+            self.assertIn('ETag', response)
+
+
+class CatalogueTest(ApiTestCase):
+    """Справочники из памяти процесса и их ETag."""
+
+    def test_ingredient_search(self):
+        Ingredient.objects.create(name='морская соль', measurement_unit='г')
+        index = IngredientIndex()
+        self.assertEqual(
+            [row['name'] for row in index.search('Сол')],
+            ['соль', 'морская соль']
+        )
+        self.assertEqual(
+            [row['name'] for row in index.search('ах')], ['сахар']
+        )
+        self.assertEqual(index.search('нет такого'), [])
+
+    def test_ingredient_search_limit(self):
+        index = IngredientIndex()
+        self.assertEqual(len(index.search('', limit=2)), 2)
+        self.assertEqual(
+            [row['name'] for row in index.search('с', limit=1)], ['сахар']
+        )
+        self.assertEqual(
+            [row['name'] for row in index.search('а', limit=3)],
+            ['мука', 'сахар', 'яйца']
+        )
+        with patch('api.views.INGREDIENT_SEARCH_LIMIT', 2):
+            response = self.client.get('/api/ingredients/', {'name': 'а'})
+        self.assertEqual(len(response.json()), 2)
+
+    def test_not_modified(self):
+        for url, change in (
+            ('/api/tags/', lambda: Tag.objects.create(
+                name='ужин', color='#000000', slug='supper'
+            )),
+            ('/api/ingredients/', lambda: Ingredient.objects.create(
+                name='перец', measurement_unit='г'
+            )),
+            ('/api/ingredients/?name=са', lambda: Ingredient.objects.filter(
+                name='сахар'
+            ).delete()),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+class ShoppingCartVersionTest(ApiTestCase):
+    """Версия списка покупок общая для процессов и хранится в базе."""
+
+    def download(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/?format=txt', **headers
+        )
+
+    def test_version_survives_cache_reset(self):
+        first, second = (
+            self.create_recipe('Рецепт 1'), self.create_recipe('Рецепт 2')
+        )
+        self.client.post(f'/api/recipes/{first.id}/shopping_cart/')
+        etag = self.download()['ETag']
+
+        cache.clear()
+        self.assertEqual(self.download(etag).status_code, 304)
+
+        self.client.post(f'/api/recipes/{second.id}/shopping_cart/')
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Рецепт 2', content)
+
+    def test_download_does_not_write(self):
+        self.create_recipe('Рецепт')
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.download()['ETag']
+            self.assertEqual(self.download(etag).status_code, 304)
+        self.assertFalse(ShoppingCartVersion.objects.exists())
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if not query['sql'].startswith('SELECT')
+        ])
+
+    def test_rename_changes_file(self):
+        recipe = self.create_recipe('Рецепт')
+        self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        etag = self.download()['ETag']
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.download(etag).status_code, 304)
+
+        self.user.first_name = 'Илья'
+        self.user.save()
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Илья', content)
+
+
+class ShoppingCartExportQueueTest(ApiTestCase):
+    """Очередь выгрузок переживает падение обработчика."""
+
+    def setUp(self):
+        super().setUp()
+        recipe = self.create_recipe('Рецепт')
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    def test_stale_export_is_reclaimed(self):
+        export = create_export(self.user, 'txt')
+        self.assertEqual(claim_export(), export)
+        ShoppingCartExport.objects.filter(id=export.id).update(
+            started=timezone.now() - EXPORT_TIMEOUT * 2
+        )
+        self.assertEqual(reclaim_stale_exports(), 1)
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingCartExport.PENDING)
+
+        call_command('process_exports', '--once', stdout=StringIO())
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingCartExport.DONE)
+        self.assertEqual(export.attempts, 2)
+
+    def test_stale_export_fails_after_max_attempts(self):
+        export = create_export(self.user, 'txt')
+        ShoppingCartExport.objects.filter(id=export.id).update(
+            status=ShoppingCartExport.RUNNING,
+            started=timezone.now() - EXPORT_TIMEOUT * 2,
+            attempts=EXPORT_MAX_ATTEMPTS
+        )
+        reclaim_stale_exports()
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingCartExport.FAILED)
+
+    def test_expired_exports_are_deleted(self):
+        export = create_export(self.user, 'txt')
+        render_export(claim_export())
+        export.refresh_from_db()
+        storage, name = export.file.storage, export.file.name
+        self.assertTrue(storage.exists(name))
+        ShoppingCartExport.objects.filter(id=export.id).update(
+            created=timezone.now() - EXPORT_RETENTION * 2
+        )
+        self.assertEqual(delete_expired_exports(), 1)
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(
+            ShoppingCartExport.objects.filter(id=export.id).exists()
+        )
+
+    def test_error_is_logged_not_shown(self):
+        export = create_export(self.user, 'txt')
+        with patch.object(
+            ShoppingCartFileGenerator, 'write',
+            side_effect=OSError('/srv/media/exports: нет места')
+        ), self.assertLogs('api.exports', 'ERROR') as logs:
+            render_export(claim_export())
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingCartExport.FAILED)
+        self.assertEqual(export.error, EXPORT_ERROR_MESSAGE)
+        self.assertIn('/srv/media/exports', '\n'.join(logs.output))
+
+    def test_reclaimed_export_is_not_overwritten(self):
+        export = create_export(self.user, 'txt')
+        claimed = claim_export()
+        ShoppingCartExport.objects.filter(id=export.id).update(
+            started=timezone.now() + EXPORT_TIMEOUT
+        )
+        directory = os.path.join(MEDIA_ROOT, 'exports', str(self.user.id))
+        os.makedirs(directory, exist_ok=True)
+        files = set(os.listdir(directory))
+        render_export(claimed)
+        export.refresh_from_db()
+        self.assertEqual(export.status, ShoppingCartExport.RUNNING)
+        self.assertFalse(export.file)
+        self.assertEqual(set(os.listdir(directory)), files)
+
+    def test_export_is_reused_for_same_cart_version(self):
+        export = create_export(self.user, 'txt')
+        self.assertEqual(create_export(self.user, 'txt'), export)
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertNotEqual(create_export(self.user, 'txt'), export)
+
+
+class UserCursorPaginationTest(ApiTestCase):
+    """Списки пользователей и подписок выводятся по курсору."""
+
+    def test_user_list_cursor(self):
+        response = self.client.get('/api/users/?cursor=&limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user['id'] for user in response.json()['results']],
+            [self.user.id]
+        )
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(
+            [user['id'] for user in response.json()['results']],
+            [self.author.id]
+        )
+
+    def test_subscriptions_cursor(self):
+        other = User.objects.create(
+            username='other', email='other@example.com',
+            first_name='Анна', last_name='Смирнова'
+        )
+        for author in (self.author, other):
+            self.client.post(f'/api/users/{author.id}/subscribe/')
+        response = self.client.get(
+            '/api/users/subscriptions/?cursor=&limit=1'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user['id'] for user in response.json()['results']], [other.id]
+        )
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(
+            [user['id'] for user in response.json()['results']],
+            [self.author.id]
+        )
+
+
+class UserListQueriesTest(ApiTestCase):
+    """Число запросов списков пользователей не зависит от их размера."""
+
+    def add_author(self, index, recipes=3):
+        author = User.objects.create(
+            username=f'author{index}', email=f'author{index}@example.com',
+            first_name='Автор', last_name=str(index)
+        )
+        for number in range(recipes):
+            self.create_recipe(f'Рецепт {index}-{number}', author=author)
+        reconcile_counter(User, 'recipes_count', Recipe, 'author')
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        return author
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()['results']
+
+    def test_subscriptions_queries(self):
+        url = '/api/users/subscriptions/?recipes_limit=2'
+        self.add_author(0)
+        queries, results = self.count_queries(url)
+        self.assertEqual(len(results[0]['recipes']), 2)
+        self.assertEqual(results[0]['recipes_count'], 3)
+        self.assertTrue(results[0]['is_subscribed'])
+
+        for index in range(1, 4):
+            self.add_author(index, recipes=index + 2)
+        self.assertEqual(self.count_queries(url)[0], queries)
+        results = self.count_queries(url)[1]
+        self.assertEqual(
+            [len(author['recipes']) for author in results], [2] * 4
+        )
+        self.assertEqual(
+            sorted(author['recipes_count'] for author in results),
+            [3, 3, 4, 5]
+        )
+
+    def test_user_list_queries(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        queries, results = self.count_queries('/api/users/')
+        self.assertEqual(
+            [user['is_subscribed'] for user in results], [False, True]
+        )
+
+        for index in range(3):
+            self.add_author(index, recipes=0)
+        self.assertEqual(self.count_queries('/api/users/')[0], queries)
+
+
+class RecipeSearchTest(ApiTestCase):
+    """Поиск видит новые и измененные рецепты после всех миграций."""
+
+    def search(self, value):
+        response = self.client.get('/api/recipes/', {'search': value})
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_search_follows_changes(self):
+        recipe = self.create_recipe('Блины')
+        self.assertEqual(self.search('блины'), [recipe.id])
+
+        recipe.name = 'Оладьи'
+        recipe.save()
+        self.assertEqual(self.search('блины'), [])
+        self.assertEqual(self.search('оладьи'), [recipe.id])
+
+    def test_cursor_keeps_rank_order(self):
+        relevant = self.create_recipe('Блины')
+        newer = self.create_recipe('Пирог')
+        Recipe.objects.filter(id=relevant.id).update(
+            pub_date=timezone.now() - timezone.timedelta(days=1)
+        )
+        newer.text = 'Тесто как на блины'
+        newer.save()
+        response = self.client.get(
+            '/api/recipes/', {'search': 'блины', 'cursor': ''}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [relevant.id, newer.id]
+        )
+
+
+class RecipeFragmentCacheTest(ApiTestCase):
+    """Общие фрагменты рецептов сбрасываются после изменений."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe('Рецепт')
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def test_fragment_is_cached(self):
+        self.client.get(self.url)
+        Recipe.objects.filter(id=self.recipe.id).update(text='Без сигналов')
+        self.assertEqual(self.client.get(self.url).json()['text'], 'Текст')
+
+    def test_recipe_and_author_changes(self):
+        self.client.get(self.url)
+        AmountRecipeIngredients.objects.filter(
+            recipe=self.recipe, ingredient=self.ingredients[0]
+        ).get().delete()
+        data = self.client.get(self.url).json()
+        self.assertEqual(
+            [item['id'] for item in data['ingredients']],
+            [self.ingredients[1].id]
+        )
+
+        self.author.username = 'new_author'
+        self.author.save()
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['author']['username'], 'new_author')
+
+    def test_catalogue_changes(self):
+        self.client.get(self.url)
+        tag, ingredient = self.tags[0], self.ingredients[0]
+        tag.name = 'поздний завтрак'
+        tag.save()
+        ingredient.name = 'мука пшеничная'
+        ingredient.save()
+        data = self.client.get(self.url).json()
+        self.assertIn(
+            'поздний завтрак', [item['name'] for item in data['tags']]
+        )
+        self.assertIn(
+            'мука пшеничная', [item['name'] for item in data['ingredients']]
+        )
+
+    def test_personal_fields_are_not_shared(self):
+        self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        data = self.client.get(self.url).json()
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['author']['is_subscribed'])
+
+        client = APIClient()
+        client.force_authenticate(self.author)
+        data = client.get(self.url).json()
+        self.assertFalse(data['is_favorited'])
+        self.assertFalse(data['author']['is_subscribed'])
+
+
+class RecipeValidationTest(ApiTestCase):
+    """Ошибки ингредиентов и тегов возвращаются по строкам."""
+
+    IMAGE = 'data:image/png;base64,' + b64encode(PNG).decode()
+
+    def payload(self, ingredients, tags):
+        return {
+            'ingredients': ingredients, 'tags': tags, 'image': self.IMAGE,
+            'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5,
+        }
+
+    def post(self, ingredients, tags):
+        return self.client.post(
+            '/api/recipes/', self.payload(ingredients, tags), format='json'
+        )
+
+    def test_errors_by_line(self):
+        flour, sugar = self.ingredients[:2]
+        response = self.post(
+            [
+                {'id': flour.id, 'amount': 1},
+                {'id': 0, 'amount': 1},
+                {'id': flour.id, 'amount': 0},
+                {'id': sugar.id, 'amount': 2},
+            ],
+            [self.tags[0].id, 0, self.tags[0].id]
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(
+            [sorted(line) for line in errors['ingredients']],
+            [[], ['id'], ['amount', 'id'], []]
+        )
+        self.assertEqual(sorted(errors['tags']), ['1', '2'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_validation_queries_do_not_grow(self):
+        def count(size):
+            ingredients = [
+                {'id': ingredient.id, 'amount': 0}
+                for ingredient in self.ingredients[:size]
+            ]
+            tags = [tag.id for tag in self.tags[:size]]
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.post(ingredients, tags).status_code, 400)
+            return len(context.captured_queries)
+
+        self.assertEqual(count(1), count(len(self.ingredients)))
+
+    def test_valid_recipe(self):
+        response = self.post(
+            [{'id': ingredient.id, 'amount': 3}
+             for ingredient in self.ingredients[:3]],
+            [tag.id for tag in self.tags]
+        )
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(id=response.json()['id'])
+        self.assertEqual(recipe.recipe_amount.count(), 3)
+        self.assertEqual(recipe.tags.count(), len(self.tags))
+
+
+class RecipeDiffUpdateTest(ApiTestCase):
+    """Правка состава рецепта меняет только отличающиеся строки."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, recipe, ingredients):
+        return self.client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 2}
+                    for ingredient in ingredients
+                ],
+                'tags': [tag.id for tag in self.tags],
+                'name': recipe.name, 'text': 'Текст', 'cooking_time': 10,
+            },
+            format='json'
+        )
+
+    def test_removed_lines_invalidate_once(self):
+        recipe = self.create_recipe('Рецепт', self.ingredients)
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        version = get_shopping_cart_version(self.user.id)
+        updated = Recipe.objects.get(id=recipe.id).updated
+
+        response = self.patch(recipe, self.ingredients[:1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(recipe.recipe_amount.values_list('ingredient_id', 'amount')),
+            [(self.ingredients[0].id, 2)]
+        )
+        self.assertEqual(get_shopping_cart_version(self.user.id), version + 1)
+        self.assertGreater(Recipe.objects.get(id=recipe.id).updated, updated)
+
+    def test_queries_do_not_grow_with_removed_lines(self):
+        def count(removed):
+            recipe = self.create_recipe(
+                f'Рецепт {removed}', self.ingredients
+            )
+            with CaptureQueriesContext(connection) as context:
+                self.patch(recipe, self.ingredients[removed:])
+            return len(context.captured_queries)
+
+        self.assertEqual(count(1), count(3))
+
+
+class RecipeImageTest(ApiTestCase):
+    """Обработка картинок рецептов и загрузка в base64."""
+
+    def test_renditions_are_rendered(self):
+        recipe = self.create_recipe('Рецепт')
+        self.assertEqual(
+            process_recipe_image(), f'{recipe}: {RENDITION_FORMAT}'
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_DONE)
+        self.assertEqual(recipe.renditions.count(), len(RENDITION_SIZES))
+        renditions = self.client.get(
+            f'/api/recipes/{recipe.id}/'
+        ).json()['renditions']
+        self.assertNotIn(recipe.image.url, renditions['thumbnail'])
+        self.assertIsNone(process_recipe_image())
+
+    def test_broken_image_is_failed(self):
+        recipe = self.create_recipe('Рецепт')
+        recipe.image.save('broken.png', ContentFile(b'broken'), save=True)
+        process_recipe_image()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_FAILED)
+        renditions = self.client.get(
+            f'/api/recipes/{recipe.id}/'
+        ).json()['renditions']
+        self.assertIn(recipe.image.url, renditions['thumbnail'])
+        self.assertIsNone(process_recipe_image())
+
+    def test_stale_claim_is_retried(self):
+        recipe = self.create_recipe('Рецепт')
+        self.assertEqual(claim_recipe_image(), recipe)
+        self.assertIsNone(claim_recipe_image())
+        Recipe.objects.filter(id=recipe.id).update(
+            image_claimed=timezone.now() - IMAGE_TIMEOUT * 2
+        )
+        process_recipe_image()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_DONE)
+
+    def test_replaced_image_stays_pending(self):
+        recipe = self.create_recipe('Рецепт')
+
+        def replace_image(claimed):
+            recipe.image.save('new.png', ContentFile(PNG + b'\0'), save=False)
+            recipe.image_status = Recipe.IMAGE_PENDING
+            recipe.save()
+
+        with patch('api.images.render_recipe_image', replace_image):
+            process_recipe_image()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_PENDING)
+
+    def test_base64_with_line_breaks(self):
+        self.client.force_authenticate(self.author)
+        buffer = BytesIO()
+        Image.frombytes('RGB', (200, 200), os.urandom(200 * 200 * 3)).save(
+            buffer, 'PNG'
+        )
+        content = buffer.getvalue()
+        encoded = b64encode(content).decode()
+        self.assertGreater(len(encoded), DECODE_CHUNK_SIZE)
+        image = 'data:image/png;base64,' + '\n'.join(
+            encoded[start:start + 76] for start in range(0, len(encoded), 76)
+        )
+        response = self.client.post(
+            '/api/recipes/',
+            {
+                'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+                'tags': [self.tags[0].id], 'image': image,
+                'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(id=response.json()['id'])
+        with recipe.image.open('rb') as file:
+            self.assertEqual(
+                file.read(), strip_image(BytesIO(content), 'image').read()
+            )
+
+    def post_image(self, image, recipe=None):
+        payload = {
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+            'tags': [self.tags[0].id],
+            'image': 'data:image/jpeg;base64,' + b64encode(image).decode(),
+            'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5,
+        }
+        if recipe is None:
+            return self.client.post('/api/recipes/', payload, format='json')
+        return self.client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json'
+        )
+
+    def test_original_is_stripped(self):
+        self.client.force_authenticate(self.author)
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        exif[0x8825] = {2: (55.0, 45.0, 0.0)}
+        buffer = BytesIO()
+        Image.new('RGB', (3200, 1600), '#808080').save(
+            buffer, 'JPEG', exif=exif
+        )
+        response = self.post_image(buffer.getvalue())
+        self.assertEqual(response.status_code, 201)
+
+        recipe = Recipe.objects.get(id=response.json()['id'])
+        with recipe.image.open('rb') as file:
+            stored = Image.open(file)
+            stored.load()
+        self.assertEqual(stored.size, (RENDITION_SIZES['full'], 800))
+        self.assertEqual(stored.format, RENDITION_FORMAT)
+        self.assertFalse(stored.getexif())
+
+    def test_same_image_is_not_requeued(self):
+        self.client.force_authenticate(self.author)
+        buffer = BytesIO()
+        Image.new('RGB', (40, 40), '#FF0000').save(buffer, 'JPEG')
+        response = self.post_image(buffer.getvalue())
+        recipe = Recipe.objects.get(id=response.json()['id'])
+        process_recipe_image()
+
+        self.assertEqual(
+            self.post_image(buffer.getvalue(), recipe).status_code, 200
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_DONE)
+
+        buffer = BytesIO()
+        Image.new('RGB', (40, 40), '#0000FF').save(buffer, 'JPEG')
+        self.post_image(buffer.getvalue(), recipe)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_PENDING)
+
+
+class MediaStorageTest(ApiTestCase):
+    """Хранилище по хешу содержимого и сборка мусора в нем."""
+
+    def collect(self):
+        MediaFile.objects.update(last_used=timezone.now() - timedelta(days=2))
+        call_command('collect_media', stdout=StringIO())
+
+    def test_same_content_is_stored_once(self):
+        name = content_storage.save('first.txt', ContentFile(b'content'))
+        self.assertEqual(
+            content_storage.save('second.txt', ContentFile(b'content')), name
+        )
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(MediaFile.objects.filter(name=name).count(), 1)
+        self.assertNotEqual(
+            content_storage.save('third.txt', ContentFile(b'other')), name
+        )
+
+    def test_unreferenced_files_are_collected(self):
+        recipe = self.create_recipe('Рецепт')
+        name = content_storage.save('orphan.txt', ContentFile(b'orphan'))
+        self.collect()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+        self.assertTrue(content_storage.exists(recipe.image.name))
+        self.assertTrue(
+            MediaFile.objects.filter(name=recipe.image.name).exists()
+        )
+
+    def test_reused_file_is_kept(self):
+        name = content_storage.save('orphan.txt', ContentFile(b'orphan'))
+
+        def upload_again():
+            content_storage.save('again.txt', ContentFile(b'orphan'))
+            return transaction.atomic()
+
+        with patch(
+            'api.management.commands.collect_media.transaction'
+        ) as mocked:
+            mocked.atomic.side_effect = upload_again
+            self.collect()
+        self.assertTrue(content_storage.exists(name))
+        self.assertTrue(MediaFile.objects.filter(name=name).exists())
+
+
+class CounterTest(ApiTestCase):
+    """Счетчики не уходят ниже нуля, даже если разошлись с данными."""
+
+    def test_drifted_counters_stay_non_negative(self):
+        recipe = self.create_recipe('Рецепт')
+        self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        Recipe.objects.filter(id=recipe.id).update(
+            favorites_count=0, in_carts_count=0
+        )
+        User.objects.filter(id=self.author.id).update(
+            subscribers_count=0, recipes_count=0
+        )
+
+        for url in (
+            f'/api/recipes/{recipe.id}/favorite/',
+            f'/api/recipes/{recipe.id}/shopping_cart/',
+            f'/api/users/{self.author.id}/subscribe/',
+        ):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(
+            self.client.delete(f'/api/recipes/{recipe.id}/').status_code, 204
+        )
+
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.subscribers_count, self.author.recipes_count), (0, 0)
+        )
+
+    def test_counters_follow_changes(self):
+        recipe = self.create_recipe('Рецепт')
+        self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_trending_ordering(self):
+        first, second, third = (
+            self.create_recipe(f'Рецепт {number}') for number in range(3)
+        )
+        self.client.post(f'/api/recipes/{second.id}/favorite/')
+        self.client.post(f'/api/recipes/{second.id}/shopping_cart/')
+        self.client.post(f'/api/recipes/{third.id}/favorite/')
+        Recipe.objects.filter(id=first.id).update(trending=50)
+        call_command('refresh_trending', stdout=StringIO())
+
+        response = self.client.get('/api/recipes/', {'ordering': 'trending'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [second.id, third.id, first.id]
+        )
+        self.assertIn(
+            'recipe_trending_idx',
+            Recipe.objects.order_by(
+                *RecipeViewSet.orderings['trending']
+            )[:10].explain()
+        )
+
+
+class FeedTest(ApiTestCase):
+    """Лента подписок идет по дате, готовая — по записям ленты."""
+
+    def setUp(self):
+        super().setUp()
+        threshold = patch('api.feeds.FEED_MATERIALIZE_THRESHOLD', 1)
+        threshold.start()
+        self.addCleanup(threshold.stop)
+        now = timezone.now()
+        self.recipes = []
+        for number in range(3):
+            recipe = self.create_recipe(f'Рецепт {number}')
+            Recipe.objects.filter(id=recipe.id).update(
+                pub_date=now - timezone.timedelta(hours=number)
+            )
+            self.recipes.append(recipe)
+        self.create_recipe('Чужой рецепт', author=self.user)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+
+    def ids(self, response):
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_pages_follow_feed_entries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/feed/', {'limit': 2})
+        self.assertEqual(self.ids(response), [
+            recipe.id for recipe in self.recipes[:2]
+        ])
+        self.assertTrue(any(
+            'FROM "recipes_feedentry"' in query['sql']
+            and 'ORDER BY "recipes_feedentry"."pub_date" DESC' in query['sql']
+            for query in queries
+        ))
+
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(self.ids(response), [self.recipes[2].id])
+        self.assertIsNone(response.json()['next'])
+
+    def test_ordering_is_ignored(self):
+        Recipe.objects.filter(id=self.recipes[2].id).update(
+            favorites_count=10, trending=10
+        )
+        expected = [recipe.id for recipe in self.recipes]
+        for threshold in (1, 100):
+            with patch('api.feeds.FEED_MATERIALIZE_THRESHOLD', threshold):
+                for ordering in ('popular', 'trending'):
+                    response = self.client.get(
+                        '/api/recipes/feed/', {'ordering': ordering}
+                    )
+                    self.assertEqual(self.ids(response), expected)
+
+    def test_recipe_filters_apply(self):
+        self.recipes[1].tags.set([self.tags[0]])
+        response = self.client.get(
+            '/api/recipes/feed/', {'tags': self.tags[1].slug}
+        )
+        self.assertEqual(
+            self.ids(response), [self.recipes[0].id, self.recipes[2].id]
+        )
+
+
+class RecipeMatchTest(ApiTestCase):
+    """Подбор по ингредиентам видит правку и удаление рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        flour, sugar, salt, eggs = self.ingredients
+        self.pancakes = self.create_recipe('Блины', [flour, sugar, eggs])
+        self.omelette = self.create_recipe('Омлет', [salt, eggs])
+        call_command('rebuild_postings', stdout=StringIO())
+
+    def match(self, *ingredients):
+        response = self.client.get('/api/recipes/match/', {
+            'ingredients': ','.join(
+                str(ingredient.id) for ingredient in ingredients
+            )
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], len(data['results']))
+        return {
+            recipe['id']: recipe['coverage'] for recipe in data['results']
+        }
+
+    def test_match_after_update(self):
+        flour, sugar, salt, eggs = self.ingredients
+        self.assertEqual(self.match(flour), {self.pancakes.id: 1 / 3})
+
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.pancakes.id}/',
+            {
+                'ingredients': [
+                    {'id': flour.id, 'amount': 1},
+                    {'id': salt.id, 'amount': 1},
+                ],
+                'tags': [self.tags[0].id],
+                'name': 'Блины', 'text': 'Текст', 'cooking_time': 10,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.match(flour), {self.pancakes.id: 1 / 2})
+        self.assertEqual(self.match(eggs), {self.omelette.id: 1 / 2})
+        self.assertEqual(
+            self.match(salt),
+            {self.pancakes.id: 1 / 2, self.omelette.id: 1 / 2}
+        )
+
+    def test_postings_follow_updates(self):
+        flour, sugar, salt, eggs = self.ingredients
+        self.client.force_authenticate(self.author)
+        self.client.patch(
+            f'/api/recipes/{self.pancakes.id}/',
+            {
+                'ingredients': [
+                    {'id': flour.id, 'amount': 1},
+                    {'id': sugar.id, 'amount': 1},
+                ],
+                'tags': [self.tags[0].id],
+                'name': 'Блины', 'text': 'Текст', 'cooking_time': 10,
+            },
+            format='json'
+        )
+        rows = set(IngredientPosting.objects.values_list(
+            'ingredient_id', 'recipe_id', 'ingredients_count'
+        ))
+        self.assertEqual(rows, {
+            (flour.id, self.pancakes.id, 2), (sugar.id, self.pancakes.id, 2),
+            (salt.id, self.omelette.id, 2), (eggs.id, self.omelette.id, 2),
+        })
+        call_command('rebuild_postings', stdout=StringIO())
+        self.assertEqual(rows, set(IngredientPosting.objects.values_list(
+            'ingredient_id', 'recipe_id', 'ingredients_count'
+        )))
+
+    def test_match_after_delete(self):
+        eggs = self.ingredients[3]
+        self.assertEqual(set(self.match(eggs)), {
+            self.pancakes.id, self.omelette.id
+        })
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.omelette.id}/')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(set(self.match(eggs)), {self.pancakes.id})
+
+
+class LoadIngredientsTest(ApiTestCase):
+    """Повторная загрузка справочников не создает дублей."""
+
+    def setUp(self):
+        super().setUp()
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        self.files = {
+            'ingredients.csv': 'мука,г\nсоль ,г \nперец,г\n,г\n',
+            'ingredients.json': json.dumps([
+                {'name': 'перец', 'measurement_unit': 'г'},
+                {
+                    'model': 'recipes.ingredient',
+                    'fields': {'name': 'молоко', 'measurement_unit': 'мл'},
+                },
+            ], ensure_ascii=False),
+            'tags.json': json.dumps([
+                {'name': 'Завтрак', 'color': '#FF0000', 'slug': 'breakfast'},
+                {'name': 'ужин', 'color': '#000080', 'slug': 'supper'},
+            ], ensure_ascii=False),
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(data_dir, name), 'w') as file:
+                file.write(content)
+        self.paths = {
+            name: os.path.join(data_dir, name) for name in self.files
+        }
+
+    def load(self):
+        call_command(
+            'load_ingredients',
+            self.paths['ingredients.csv'], self.paths['ingredients.json'],
+            '--tags', self.paths['tags.json'], stdout=StringIO()
+        )
+
+    def test_reload_is_idempotent(self):
+        versions = [get_catalogue_version('ingredients').version]
+        for _ in range(2):
+            self.load()
+            cache.clear()
+            versions.append(get_catalogue_version('ingredients').version)
+            self.assertEqual(Ingredient.objects.count(), 6)
+            self.assertEqual(Tag.objects.count(), 3)
+
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            )),
+            sorted([
+                ('мука', 'г'), ('сахар', 'г'), ('соль', 'г'), ('яйца', 'г'),
+                ('перец', 'г'), ('молоко', 'мл'),
+            ])
+        )
+        self.assertEqual(
+            Tag.objects.values_list('name', 'color').get(slug='breakfast'),
+            ('Завтрак', '#FF0000')
+        )
+        self.assertEqual(versions, [versions[0] + run for run in range(3)])
+
+
+class ShoppingListTest(ApiTestCase):
+    """Сводный список покупок складывает единицы и отдается потоком."""
+
+    def setUp(self):
+        super().setUp()
+        pancakes = self.create_recipe('Блины')
+        pancakes.recipe_amount.filter(
+            ingredient=self.ingredients[0]
+        ).update(amount=500)
+        pancakes.recipe_amount.filter(
+            ingredient=self.ingredients[1]
+        ).update(amount=1000)
+        pie = self.create_recipe('Пирог', [
+            Ingredient.objects.create(
+                name=ingredient.name, measurement_unit='кг'
+            )
+            for ingredient in self.ingredients[:2]
+        ])
+        for recipe in (pancakes, pie):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    def test_units_are_merged(self):
+        response = self.client.get('/api/recipes/shopping_list/')
+        self.assertEqual(response.json(), {
+            'recipes': ['Блины', 'Пирог'],
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 1500},
+                {'name': 'сахар', 'measurement_unit': 'кг', 'amount': 2},
+            ],
+        })
+
+    def test_format_parameter(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            b''.join(response.streaming_content).startswith(b'%PDF')
+        )
+        response = self.client.get('/api/recipes/', {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_header_is_sent_before_ingredients_query(self):
+        generator = ShoppingCartFileGenerator(self.user)
+        lines = generator.create_shopping_cart_list()
+        with CaptureQueriesContext(connection) as queries:
+            header = next(lines)
+        self.assertIn('"Блины", "Пирог"', header)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(
+            'recipes_amountrecipeingredients', queries[0]['sql']
+        )
+        self.assertEqual(list(lines), ['мука: 1500 г', 'сахар: 2 кг'])
+
+
+class SimilarRecipesTest(ApiTestCase):
+    """Похожие рецепты считаются заранее и отдаются по сходству."""
+
+    def similar(self, recipe):
+        response = self.client.get(f'/api/recipes/{recipe.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()]
+
+    def compute(self):
+        call_command('compute_similar', stdout=StringIO())
+
+    def test_ranking(self):
+        flour, sugar, salt, eggs = self.ingredients
+        pancakes = self.create_recipe('Блины', [flour, sugar, eggs])
+        fritters = self.create_recipe('Оладьи', [flour, sugar, eggs])
+        bread = self.create_recipe('Хлеб', [flour, salt])
+        self.create_recipe('Рассол', [salt])
+        self.compute()
+
+        self.assertEqual(self.similar(pancakes), [fritters.id, bread.id])
+        scores = SimilarRecipe.objects.filter(
+            recipe=pancakes
+        ).order_by('-score').values_list('score', flat=True)
+        for score, expected in zip(scores, [
+            INGREDIENT_WEIGHT + TAG_WEIGHT,
+            INGREDIENT_WEIGHT / 4 + TAG_WEIGHT,
+        ]):
+            self.assertAlmostEqual(score, expected)
+        self.assertEqual(
+            self.client.get('/api/recipes/0/similar/').status_code, 404
+        )
+
+    @patch('api.similar.COMMON_INGREDIENT_MIN', 2)
+    def test_only_common_ingredients(self):
+        flour, sugar, salt, eggs = self.ingredients
+        brine = self.create_recipe('Рассол', [salt])
+        omelette = self.create_recipe('Омлет', [salt, eggs])
+        bread = self.create_recipe('Хлеб', [salt, flour])
+        self.compute()
+
+        self.assertEqual(set(self.similar(brine)), {omelette.id, bread.id})
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, RecipeViewSet,
+                    ShoppingCartExportViewSet, TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -10,6 +11,9 @@ router.register(r'users', UserViewSet, basename='users')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'tags', TagViewSet, basename='tags')
+router.register(
+    r'exports', ShoppingCartExportViewSet, basename='exports'
+)
 
 urlpatterns = (
     path('', include(router.urls)),
@@ -0,0 +1,21 @@
+from typing import Set
+
+from rest_framework.request import Request
+from users.models import Subscription
+
+
+def get_subscribed_authors(request: Request) -> Set[int]:
+    """ID авторов, на которых подписан пользователь запроса.
+
+    Выбираются одним запросом и сохраняются в объекте запроса,
+    поэтому вьюсеты и сериализаторы используют общий набор.
+    """
+    if request is None or request.user.is_anonymous:
+        return set()
+    if not hasattr(request, '_subscribed_authors'):
+        request._subscribed_authors = set(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request._subscribed_authors
@@ -1,25 +1,44 @@
-from typing import Type
+from typing import List, Optional, Type
 
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import FileResponse, Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
-                            User)
-from rest_framework import status, viewsets
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartExport, Tag, User)
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from users.models import Subscription
 
+from .cache import (catalogue_etag, catalogue_last_modified,
+                    get_catalogue_version, shopping_cart_etag)
+from .counters import decremented
+from .exports import create_export
+from .feeds import (fan_out_recipe, feed_queryset, feed_recipes,
+                    is_materialized, materialized_feed)
 from .filters import IngredientFilter, RecipeFilter
 from .generator import ShoppingCartFileGenerator
-from .mixins import RecipeMixin, UserMixin
-from .paginator import CustomPagination
+from .indexes import INGREDIENT_SEARCH_LIMIT, ingredient_index, tag_index
+from .matching import match_recipes
+from .mixins import ConditionalGetMixin, RecipeMixin, UserMixin
+from .negotiation import FileFormatContentNegotiation
+from .paginator import CustomPagination, KeysetPagination
 from .permissions import IsAdminOrOwnerOrReadOnly, IsAdminOrReadOnly
 from .serializers import (AmountRecipeIngredients, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeReadSerializer,
-                          RecipeSerializer, SubscriptionSerializer,
+                          RecipeCreateSerializer, RecipeMatchSerializer,
+                          RecipeReadSerializer, RecipeSerializer,
+                          ShoppingCartExportSerializer, SubscriptionSerializer,
                           TagSerializer)
+from .shopping_list import aggregate_shopping_cart
+from .similar import SIMILAR_RESULTS_LIMIT
+from .utils import get_subscribed_authors
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -29,6 +48,14 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    @method_decorator(condition(
+        etag_func=catalogue_etag('tags'),
+        last_modified_func=catalogue_last_modified('tags'),
+    ))
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Список тегов из кэша процесса."""
+        return Response(tag_index.all())
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингридиентов."""
@@ -39,31 +66,119 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
 
+    @method_decorator(condition(
+        etag_func=catalogue_etag('ingredients'),
+        last_modified_func=catalogue_last_modified('ingredients'),
+    ))
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Список ингредиентов.
+
+        Весь справочник и поиск по названию для автодополнения
+        отдаются из индекса в памяти, остальные запросы идут в базу.
+        """
+        if not request.query_params:
+            return Response(ingredient_index.all())
+        if set(request.query_params) == {'name'}:
+            return Response(ingredient_index.search(
+                request.query_params['name'], INGREDIENT_SEARCH_LIMIT
+            ))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet, RecipeMixin):
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet, RecipeMixin):
     """Вьюсет рецептов."""
 
-    queryset = Recipe.objects.select_related('author').prefetch_related(
+    queryset = Recipe.objects.select_related('author')
+    prefetch_lookups = [
         'tags',
+        'renditions',
         Prefetch(
             'recipe_amount',
             queryset=AmountRecipeIngredients.objects.select_related(
                 'ingredient'
             )
         ),
-    )
+    ]
     permission_classes = [IsAdminOrOwnerOrReadOnly]
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
     filter_backends = [DjangoFilterBackend]
+    orderings = {
+        'popular': ['-favorites_count', '-id'],
+        'trending': ['-trending', '-id'],
+    }
+    etag_fields = [
+        'id', 'updated', 'pub_date', 'is_favorited', 'is_in_shopping_cart',
+        'author_id', 'author__username', 'author__email',
+        'author__first_name', 'author__last_name',
+    ]
+
+    @property
+    def cursor_ordering(self) -> Optional[List[str]]:
+        """Порядок из параметра ordering (popular, trending).
+
+        Результаты поиска идут по релевантности и выводятся
+        по номерам страниц, поэтому для них порядка нет.
+        """
+        if self.request.query_params.get('search'):
+            return None
+        return self.orderings.get(
+            self.request.query_params.get('ordering'),
+            ['-pub_date', '-id']
+        )
+
+    def get_queryset(self):
+        """Рецепты с отметками избранного и списка покупок.
+
+        Сортировки popular и trending идут по индексам счетчиков
+        рецепта без агрегации и соединений.
+        """
+        queryset = super().get_queryset()
+        ordering = self.request.query_params.get('ordering')
+        if ordering in self.orderings:
+            queryset = queryset.order_by(*self.orderings[ordering])
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
+    def get_etag_extra(self):
+        """Подписки пользователя и версии справочников в ответе."""
+        return (
+            sorted(get_subscribed_authors(self.request)),
+            get_catalogue_version('tags').version,
+            get_catalogue_version('ingredients').version,
+        )
 
     def get_serializer_class(self) -> Type[RecipeSerializer]:
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer) -> None:
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+        fan_out_recipe(recipe)
+
+    @transaction.atomic
+    def perform_destroy(self, instance: Recipe) -> None:
+        instance.delete()
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=decremented('recipes_count')
+        )
 
     @action(
         detail=True, permission_classes=[IsAuthenticated],
@@ -72,6 +187,7 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeMixin):
     def favorite(self, request, pk: int):
         """Добавление и удаление из избранного."""
         self.model_class = Favorite
+        self.counter_field = 'favorites_count'
         return self._add_delete_method(request, self.request.user, pk)
 
     @action(
@@ -81,12 +197,15 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeMixin):
     def shopping_cart(self, request, pk: int):
         """Добавление и удаление из списка покупок."""
         self.model_class = ShoppingCart
+        self.counter_field = 'in_carts_count'
         return self._add_delete_method(request, self.request.user, pk)
 
     @action(
         detail=False, methods=['GET'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=FileFormatContentNegotiation
     )
+    @method_decorator(condition(etag_func=shopping_cart_etag))
     def download_shopping_cart(self, request: Request):
         """Скачивание файла с ингредиентами в нескольких форматах."""
         user = request.user
@@ -95,7 +214,7 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeMixin):
                 f'Это для {user.username}',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        generator = ShoppingCartFileGenerator(request)
+        generator = ShoppingCartFileGenerator(user)
         format_to_method = {
             'pdf': generator.generate_pdf,
             'doc': generator.generate_doc,
@@ -108,6 +227,132 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeMixin):
             return generate_method(shopping_cart)
         return Response()
 
+    @action(
+        detail=False, methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    @method_decorator(condition(etag_func=shopping_cart_etag))
+    def shopping_list(self, request: Request):
+        """Сводный список покупок в формате json."""
+        return Response(aggregate_shopping_cart(request.user))
+
+    @action(detail=False, methods=['GET'])
+    def match(self, request: Request) -> Response:
+        """Рецепты по доле ингредиентов, которые есть у пользователя.
+
+        ID ингредиентов передаются параметром ingredients
+        через запятую или несколькими параметрами.
+        """
+        ingredient_ids = [
+            int(value)
+            for values in request.query_params.getlist('ingredients')
+            for value in values.split(',')
+            if value.strip().isdigit()
+        ]
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': ['Укажите ID ингредиентов.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(match_recipes(ingredient_ids))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        matched = []
+        for recipe_id, coverage in page:
+            if recipe_id in recipes:
+                recipes[recipe_id].coverage = coverage
+                matched.append(recipes[recipe_id])
+        serializer = RecipeMatchSerializer(
+            matched, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['GET'])
+    def similar(self, request: Request, pk: int) -> Response:
+        """Похожие рецепты, рассчитанные заранее командой compute_similar."""
+        queryset = self.get_queryset().filter(
+            similar_to__recipe_id=pk
+        ).order_by('-similar_to__score', '-id')[:SIMILAR_RESULTS_LIMIT]
+        if not queryset and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        serializer = RecipeReadSerializer(
+            queryset, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request: Request) -> Response:
+        """Новые рецепты авторов, на которых подписан пользователь.
+
+        Лента всегда идет по дате, параметр ordering не учитывается.
+        Готовая лента выводится по курсору на записях ленты,
+        затем загружаются рецепты страницы.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        authors = get_subscribed_authors(request)
+        paginator = KeysetPagination()
+        if is_materialized(len(authors)):
+            paginator.ordering = ['-pub_date', '-recipe_id']
+            page = feed_recipes(queryset, paginator.paginate_queryset(
+                materialized_feed(queryset, request.user), request
+            ))
+        else:
+            page = paginator.paginate_queryset(
+                feed_queryset(queryset, authors), request
+            )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ShoppingCartExportViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    """Вьюсет фоновых выгрузок списка покупок."""
+
+    serializer_class = ShoppingCartExportSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        return self.request.user.shopping_exports.all()
+
+    def create(self, request: Request) -> Response:
+        """Постановка выгрузки в очередь."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        if not user.shopping.exists():
+            return Response(
+                f'Это для {user.username}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        export = create_export(user, serializer.validated_data['format'])
+        return Response(
+            self.get_serializer(export).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request: Request, pk: int):
+        """Скачивание готового файла выгрузки."""
+        export = self.get_object()
+        if export.status != ShoppingCartExport.DONE:
+            return Response(
+                self.get_serializer(export).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+        return FileResponse(
+            export.file.open('rb'), as_attachment=True,
+            filename=f'{request.user.username}_ingredient_list.{export.format}'
+        )
+
 
 class UserViewSet(UserViewSet, UserMixin):
     """Вьюсет пользователя."""
@@ -117,6 +362,30 @@ class UserViewSet(UserViewSet, UserMixin):
     permission_classes = [IsAdminOrOwnerOrReadOnly]
     serializer_class = SubscriptionSerializer
 
+    @property
+    def cursor_ordering(self) -> List[str]:
+        """Подписки по дате подписки, остальные списки по ID.
+
+        Поле pub_date есть только в выборке подписок.
+        """
+        if self.action == 'subscriptions':
+            return ['-pub_date', '-id']
+        return ['id']
+
+    def get_queryset(self):
+        """Пользователи с рецептами.
+
+        Параметр recipes_limit ограничивает число рецептов,
+        подгружаемых для каждого автора.
+        """
+        recipes = Recipe.objects.prefetch_related('renditions')
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes[:int(recipes_limit)]
+        return super().get_queryset().prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated]
@@ -131,10 +400,15 @@ class UserViewSet(UserViewSet, UserMixin):
     )
     def subscriptions(self, request: Request) -> Response:
         """Подписки пользователя."""
-        user = request.user
-        subscriptions = User.objects.filter(
-            subscribing__user=user
-        ).prefetch_related('recipes')
+        subscriptions = self.get_queryset().filter(
+            id__in=get_subscribed_authors(request)
+        ).annotate(
+            pub_date=Subquery(
+                Subscription.objects.filter(
+                    user=request.user, author=OuterRef('pk')
+                ).values('pub_date')
+            )
+        )
         paginated_queryset = self.paginate_queryset(subscriptions)
         serializer = self.get_serializer(paginated_queryset, many=True)
         return self.get_paginated_response(serializer.data)
@@ -1,8 +1,11 @@
+from os.path import splitext
+
+from api.images import strip_image
 from django.contrib import admin
 from django.utils.html import format_html
 
 from .models import (AmountRecipeIngredients, Favorite, Ingredient, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingCartExport, Tag)
 
 
 def tag_color(tag: Tag):
@@ -48,16 +51,26 @@ class RecipeAdmin(admin.ModelAdmin):
         'text', 'cooking_time'
     ]
 
-    @admin.display(description='Избранное')
+    def save_model(self, request, obj: Recipe, form, change: bool) -> None:
+        """Новая картинка ставится в очередь на обработку.
+
+        Картинка сохраняется заново, без метаданных.
+        """
+        if 'image' in form.changed_data:
+            upload = form.cleaned_data['image']
+            obj.image = strip_image(upload, splitext(upload.name)[0])
+            obj.image_status = Recipe.IMAGE_PENDING
+        super().save_model(request, obj, form, change)
+
+    @admin.display(description='Избранное', ordering='favorites_count')
     def is_favorited(self, obj: Recipe) -> bool:
         """Проверка избранных рецептов.
 
-        Проверяет, есть ли избранные рецепты у пользователя
-        и выдает количесвто.
+        Выдает количество добавлений рецепта в избранное
+        из поля-счетчика.
         """
-        count = obj.in_favorited.count()
-        if count > 0:
-            return f'{count} ⭐️'
+        if obj.favorites_count > 0:
+            return f'{obj.favorites_count} ⭐️'
 
     @admin.display(description='Картинка')
     def is_image(self, obj: Recipe):
@@ -113,3 +126,12 @@ class FavoriteAdmin(admin.ModelAdmin):
 
     list_display = ['user', 'recipe']
     search_fields = ['user__username', 'recipe__name']
+
+
+@admin.register(ShoppingCartExport)
+class ShoppingCartExportAdmin(admin.ModelAdmin):
+    """Администрирование выгрузок списка покупок."""
+
+    list_display = ['user', 'format', 'status', 'attempts', 'created']
+    list_filter = ['status', 'format']
+    search_fields = ['user__username']
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from recipes.search_sql import (SQLITE_FTS_REBUILD, SQLITE_FTS_TABLE,
+                                SQLITE_TRIGGERS)
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update();
+    """,
+    'UPDATE recipes_recipe SET name = name;',
+    """
+    CREATE INDEX recipes_recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector);
+    """,
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx;',
+    """
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON recipes_recipe;
+    """,
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update();',
+]
+
+SQLITE_FORWARD = [
+    SQLITE_FTS_TABLE, *SQLITE_TRIGGERS.values(), SQLITE_FTS_REBUILD
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert;',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete;',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update;',
+    'DROP TABLE IF EXISTS recipes_recipe_fts;',
+]
+
+
+def run_statements(statements):
+    """Выполнение SQL для текущей СУБД."""
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_statements({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run_statements({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_processed',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Копии картинки готовы'),
+        ),
+        migrations.CreateModel(
+            name='RecipeImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(choices=[('thumbnail', 'Миниатюра'), ('card', 'Карточка'), ('full', 'Полный размер')], max_length=10, verbose_name='Размер')),
+                ('file', models.ImageField(height_field='height', upload_to='recipes/renditions/', verbose_name='Файл', width_field='width')),
+                ('width', models.PositiveSmallIntegerField(default=0, verbose_name='Ширина')),
+                ('height', models.PositiveSmallIntegerField(default=0, verbose_name='Высота')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Копия картинки рецепта',
+                'verbose_name_plural': 'Копии картинок рецептов',
+                'unique_together': {('recipe', 'size')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:22
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Размер')),
+                ('last_used', models.DateTimeField(db_index=True, verbose_name='Дата последней загрузки')),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Картинка'),
+        ),
+        migrations.AlterField(
+            model_name='recipeimagerendition',
+            name='file',
+            field=models.ImageField(height_field='height', storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/renditions/', verbose_name='Файл', width_field='width'),
+        ),
+    ]
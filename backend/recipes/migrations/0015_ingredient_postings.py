@@ -0,0 +1,55 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:26
+
+from array import array
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_postings(apps, schema_editor):
+    AmountRecipeIngredients = apps.get_model(
+        'recipes', 'AmountRecipeIngredients'
+    )
+    IngredientPostings = apps.get_model('recipes', 'IngredientPostings')
+    recipes = {}
+    for recipe_id, ingredient_id in AmountRecipeIngredients.objects.order_by(
+    ).values_list('recipe_id', 'ingredient_id').iterator():
+        recipes.setdefault(recipe_id, []).append(ingredient_id)
+    postings = {}
+    for recipe_id in sorted(recipes):
+        ingredient_ids = recipes[recipe_id]
+        for ingredient_id in ingredient_ids:
+            postings.setdefault(ingredient_id, array('Q')).append(
+                recipe_id << 8 | min(len(ingredient_ids), 255)
+            )
+    IngredientPostings.objects.bulk_create(
+        [
+            IngredientPostings(
+                ingredient_id=ingredient_id, recipes=items.tobytes()
+            )
+            for ingredient_id, items in postings.items()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_follow_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPostings',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='postings', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('recipes', models.BinaryField(default=bytes, verbose_name='Рецепты')),
+            ],
+            options={
+                'verbose_name': 'Рецепты ингредиента',
+                'verbose_name_plural': 'Рецепты ингредиентов',
+            },
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
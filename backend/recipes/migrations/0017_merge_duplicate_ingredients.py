@@ -0,0 +1,81 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:30
+
+from array import array
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def merge_duplicates(apps, schema_editor):
+    """Слияние повторов ингредиентов в запись с наименьшим ID."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    AmountRecipeIngredients = apps.get_model(
+        'recipes', 'AmountRecipeIngredients'
+    )
+    IngredientPostings = apps.get_model('recipes', 'IngredientPostings')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    kept = {}
+    duplicates = {}
+    for ingredient_id, name, unit in Ingredient.objects.order_by(
+        'id'
+    ).values_list('id', 'name', 'measurement_unit').iterator():
+        if (name, unit) in kept:
+            duplicates[ingredient_id] = kept[name, unit]
+        else:
+            kept[name, unit] = ingredient_id
+    if not duplicates:
+        return
+
+    changed = set()
+    for amount in AmountRecipeIngredients.objects.filter(
+        ingredient_id__in=duplicates
+    ):
+        target = AmountRecipeIngredients.objects.filter(
+            recipe_id=amount.recipe_id,
+            ingredient_id=duplicates[amount.ingredient_id]
+        ).first()
+        if target:
+            target.amount += amount.amount
+            target.save(update_fields=['amount'])
+            amount.delete()
+        else:
+            amount.ingredient_id = duplicates[amount.ingredient_id]
+            amount.save(update_fields=['ingredient'])
+        changed.add(amount.recipe_id)
+    Ingredient.objects.filter(id__in=duplicates).delete()
+    if not changed:
+        return
+
+    Recipe.objects.filter(id__in=changed).update(updated=timezone.now())
+    recipes = {}
+    for recipe_id, ingredient_id in AmountRecipeIngredients.objects.order_by(
+    ).values_list('recipe_id', 'ingredient_id').iterator():
+        recipes.setdefault(recipe_id, []).append(ingredient_id)
+    postings = {}
+    for recipe_id in sorted(recipes):
+        ingredient_ids = recipes[recipe_id]
+        for ingredient_id in ingredient_ids:
+            postings.setdefault(ingredient_id, array('Q')).append(
+                recipe_id << 8 | min(len(ingredient_ids), 255)
+            )
+    IngredientPostings.objects.all().delete()
+    IngredientPostings.objects.bulk_create(
+        [
+            IngredientPostings(
+                ingredient_id=ingredient_id, recipes=items.tobytes()
+            )
+            for ingredient_id, items in postings.items()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='ingredient',
+            unique_together={('name', 'measurement_unit')},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+        ('recipes', '0018_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shopping_cart_version', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия списка покупок',
+                'verbose_name_plural': 'Версии списков покупок',
+            },
+        ),
+    ]
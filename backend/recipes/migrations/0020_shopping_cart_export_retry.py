@@ -0,0 +1,28 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_shopping_cart_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcartexport',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Число попыток'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcartexport',
+            name='started',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата начала обработки'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcartexport',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+    ]
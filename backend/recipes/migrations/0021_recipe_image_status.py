@@ -0,0 +1,29 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+def copy_image_status(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(image_processed=True).update(image_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_shopping_cart_export_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_claimed',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата начала обработки картинки'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], db_index=True, default='pending', editable=False, max_length=10, verbose_name='Обработка картинки'),
+        ),
+        migrations.RunPython(copy_image_status, migrations.RunPython.noop),
+    ]
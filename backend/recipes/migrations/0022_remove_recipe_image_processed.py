@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='image_processed',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+def copy_trending(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    for recipe_id, trending in RecipeScore.objects.filter(
+        trending__gt=0
+    ).values_list('recipe_id', 'trending').iterator():
+        Recipe.objects.filter(id=recipe_id).update(trending=trending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0022_remove_recipe_image_processed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавления за последнее время'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending', '-id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(copy_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:57
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_postings(apps, schema_editor):
+    AmountRecipeIngredients = apps.get_model(
+        'recipes', 'AmountRecipeIngredients'
+    )
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    counts = dict(
+        AmountRecipeIngredients.objects.order_by().values(
+            'recipe_id'
+        ).annotate(count=Count('pk')).values_list('recipe_id', 'count')
+    )
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id, recipe_id=recipe_id,
+                ingredients_count=counts[recipe_id]
+            )
+            for recipe_id, ingredient_id in
+            AmountRecipeIngredients.objects.order_by().values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_delete_recipescore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredients_count', models.PositiveSmallIntegerField(verbose_name='Ингредиентов в рецепте')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Рецепт ингредиента',
+                'verbose_name_plural': 'Рецепты ингредиентов',
+                'unique_together': {('ingredient', 'recipe')},
+            },
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0025_ingredient_posting_rows'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='IngredientPostings',
+        ),
+    ]
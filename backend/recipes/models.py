@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
-from .common import upload_to
+from .storage import content_storage
 from .validators import validate_hex_color, validate_tag
 
 User = get_user_model()
@@ -45,6 +46,7 @@ class Ingredient(models.Model):
 
     name = models.CharField(
         max_length=200,
+        db_index=True,
         verbose_name='Ингредиент',
     )
     measurement_unit = models.CharField(
@@ -56,14 +58,33 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['id']
+        unique_together = [('name', 'measurement_unit')]
 
     def __str__(self) -> str:
         return f'{self.name} {self.measurement_unit}'
 
 
+class RecipeManager(models.Manager):
+    """Менеджер рецептов без загрузки поискового вектора."""
+
+    def get_queryset(self) -> models.QuerySet:
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
 
+    IMAGE_PENDING = 'pending'
+    IMAGE_RUNNING = 'running'
+    IMAGE_DONE = 'done'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = [
+        (IMAGE_PENDING, 'В очереди'),
+        (IMAGE_RUNNING, 'Выполняется'),
+        (IMAGE_DONE, 'Готово'),
+        (IMAGE_FAILED, 'Ошибка'),
+    ]
+
     name = models.CharField(
         max_length=200,
         verbose_name='Название рецепта',
@@ -87,7 +108,22 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name='Картинка',
-        upload_to=upload_to,
+        upload_to='recipes/',
+        storage=content_storage,
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_PENDING,
+        db_index=True,
+        editable=False,
+        verbose_name='Обработка картинки',
+    )
+    image_claimed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата начала обработки картинки',
     )
     text = models.TextField(
         max_length=200,
@@ -101,6 +137,32 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания рецепта',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения рецепта',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
+    trending = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавления за последнее время',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -108,6 +170,24 @@ class Recipe(models.Model):
         default_related_name = 'resipes'
         ordering = ['-id']
         unique_together = [('name', 'author')]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_count_idx',
+            ),
+            models.Index(
+                fields=['-trending', '-id'],
+                name='recipe_trending_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.name} {self.author.username}'
@@ -160,6 +240,11 @@ class Favorite(models.Model):
         verbose_name='Избранный рецепт',
         related_name='in_favorited',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -185,6 +270,11 @@ class ShoppingCart(models.Model):
         verbose_name='Список покупок',
         related_name='in_shopping',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -195,3 +285,319 @@ class ShoppingCart(models.Model):
         return (
             f'Пользователь {self.user} добавил {self.recipe} в список покупок.'
         )
+
+
+class FeedEntry(models.Model):
+    """Рецепт в готовой ленте подписок пользователя.
+
+    Ленты хранятся только для пользователей с большим числом
+    подписок, остальным лента собирается при чтении.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата создания рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        unique_together = [('user', 'recipe')]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class IngredientPosting(models.Model):
+    """Обратный индекс: рецепт, в котором есть ингредиент.
+
+    Одна строка на пару ингредиента и рецепта вместе с числом
+    ингредиентов рецепта, поэтому правка рецепта меняет только
+    его строки и не блокирует записи других рецептов.
+    """
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Ингредиент',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Рецепт',
+    )
+    ingredients_count = models.PositiveSmallIntegerField(
+        verbose_name='Ингредиентов в рецепте',
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт ингредиента'
+        verbose_name_plural = 'Рецепты ингредиентов'
+        unique_together = [('ingredient', 'recipe')]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient_id}: {self.recipe_id}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт, найденный командой compute_similar.
+
+    Сходство — взвешенная сумма коэффициентов Жаккара
+    по ингредиентам и тегам.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        unique_together = [('recipe', 'similar')]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} -> {self.similar_id}: {self.score:.2f}'
+
+
+class RecipeImageRendition(models.Model):
+    """Уменьшенная копия картинки рецепта."""
+
+    THUMBNAIL = 'thumbnail'
+    CARD = 'card'
+    FULL = 'full'
+    SIZES = [
+        (THUMBNAIL, 'Миниатюра'),
+        (CARD, 'Карточка'),
+        (FULL, 'Полный размер'),
+    ]
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='renditions',
+        verbose_name='Рецепт',
+    )
+    size = models.CharField(
+        max_length=10,
+        choices=SIZES,
+        verbose_name='Размер',
+    )
+    file = models.ImageField(
+        upload_to='recipes/renditions/',
+        storage=content_storage,
+        width_field='width',
+        height_field='height',
+        verbose_name='Файл',
+    )
+    width = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Ширина',
+    )
+    height = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Высота',
+    )
+
+    class Meta:
+        verbose_name = 'Копия картинки рецепта'
+        verbose_name_plural = 'Копии картинок рецептов'
+        unique_together = [('recipe', 'size')]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} {self.size}'
+
+
+class ShoppingCartExport(models.Model):
+    """Задание на выгрузку списка покупок."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+    FORMATS = [
+        ('pdf', 'pdf'),
+        ('doc', 'doc'),
+        ('txt', 'txt'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_exports',
+    )
+    format = models.CharField(
+        max_length=3,
+        choices=FORMATS,
+        verbose_name='Формат',
+    )
+    version = models.CharField(
+        max_length=32,
+        verbose_name='Версия списка покупок',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True,
+        verbose_name='Статус',
+    )
+    file = models.FileField(
+        upload_to='exports/',
+        blank=True,
+        verbose_name='Файл',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания',
+    )
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата начала обработки',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Число попыток',
+    )
+
+    class Meta:
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+        ordering = ['-created']
+
+    def __str__(self) -> str:
+        return f'Выгрузка {self.format} для {self.user}: {self.status}'
+
+
+class CatalogueVersion(models.Model):
+    """Версия справочника.
+
+    Общая для всех процессов: по ней сбрасываются кэши тегов
+    и ингредиентов после изменений в админке.
+    """
+
+    name = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Справочник',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.version}'
+
+
+class ShoppingCartVersion(models.Model):
+    """Версия списка покупок пользователя.
+
+    Общая для всех процессов: по ней сбрасываются готовые файлы
+    и ETag списка покупок после его изменения.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_version',
+        verbose_name='Пользователь',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия',
+    )
+
+    class Meta:
+        verbose_name = 'Версия списка покупок'
+        verbose_name_plural = 'Версии списков покупок'
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.version}'
+
+
+class MediaFile(models.Model):
+    """Файл хранилища с именем по хешу содержимого.
+
+    По этой таблице команда collect_media находит файлы,
+    на которые больше не ссылается ни одна запись.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Имя файла',
+    )
+    size = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Размер',
+    )
+    last_used = models.DateTimeField(
+        db_index=True,
+        verbose_name='Дата последней загрузки',
+    )
+
+    class Meta:
+        verbose_name = 'Файл хранилища'
+        verbose_name_plural = 'Файлы хранилища'
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,71 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .search_sql import SQLITE_FTS_REBUILD, SQLITE_TRIGGERS
+
+
+def restore_sqlite_triggers(using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """Восстановление триггеров FTS5 после миграций.
+
+    SQLite пересоздает таблицу рецептов при многих изменениях схемы
+    и теряет ее триггеры, поэтому недостающие создаются заново,
+    а поисковая таблица пересобирается.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    names = ['recipes_recipe_fts', *SQLITE_TRIGGERS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * len(names))
+            ),
+            names
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = SQLITE_TRIGGERS.keys() - existing
+        if 'recipes_recipe_fts' not in existing or not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(SQLITE_FTS_REBUILD)
+
+
+def fts5_query(value: str) -> str:
+    """Запрос FTS5: слова в кавычках с поиском по началу слова."""
+    words = value.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset: QuerySet, value: str) -> QuerySet:
+    """Полнотекстовый поиск рецептов по названию и описанию.
+
+    В PostgreSQL используется поле search_vector с GIN-индексом,
+    в SQLite — таблица FTS5. Результаты упорядочены по релевантности.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+
+    query = fts5_query(value)
+    if not query:
+        return queryset.none()
+    return queryset.filter(
+        id__in=RawSQL(
+            'SELECT rowid FROM recipes_recipe_fts '
+            'WHERE recipes_recipe_fts MATCH %s',
+            (query,)
+        )
+    ).annotate(
+        rank=RawSQL(
+            'SELECT -bm25(recipes_recipe_fts, 10.0, 1.0) '
+            'FROM recipes_recipe_fts '
+            'WHERE recipes_recipe_fts MATCH %s '
+            'AND recipes_recipe_fts.rowid = recipes_recipe.id',
+            (query,)
+        )
+    ).order_by('-rank', '-id')
@@ -0,0 +1,46 @@
+# SQL полнотекстового поиска в SQLite. Используется миграцией 0006
+# и восстановлением триггеров после миграций.
+
+SQLITE_FTS_TABLE = """
+    CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id'
+    );
+"""
+
+# Триггеры, которые поддерживают таблицу FTS5 в SQLite.
+SQLITE_TRIGGERS = {
+    'recipes_recipe_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+        AFTER INSERT ON recipes_recipe
+        BEGIN
+            INSERT INTO recipes_recipe_fts(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END;
+    """,
+    'recipes_recipe_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+        AFTER DELETE ON recipes_recipe
+        BEGIN
+            INSERT INTO recipes_recipe_fts(
+                recipes_recipe_fts, rowid, name, text
+            )
+            VALUES ('delete', old.id, old.name, old.text);
+        END;
+    """,
+    'recipes_recipe_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+        AFTER UPDATE ON recipes_recipe
+        BEGIN
+            INSERT INTO recipes_recipe_fts(
+                recipes_recipe_fts, rowid, name, text
+            )
+            VALUES ('delete', old.id, old.name, old.text);
+            INSERT INTO recipes_recipe_fts(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END;
+    """,
+}
+
+SQLITE_FTS_REBUILD = (
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild');"
+)
@@ -0,0 +1,80 @@
+from datetime import datetime
+from hashlib import sha256
+from os.path import splitext
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Exists, FileField, OuterRef, QuerySet
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# Каталог media, в котором лежат файлы с именами по хешу содержимого.
+CONTENT_PREFIX = 'content'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — хеш его содержимого.
+
+    Одинаковые файлы хранятся один раз, а содержимое по адресу
+    никогда не меняется, поэтому адреса можно кэшировать бессрочно.
+    """
+
+    def content_name(self, name: str, content: File) -> str:
+        """Имя, под которым будет сохранено содержимое."""
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = splitext(name)[1].lower()
+        return (
+            f'{CONTENT_PREFIX}/{digest[:2]}/{digest[2:4]}/'
+            f'{digest}{extension}'
+        )
+
+    def save(self, name, content, max_length=None) -> str:
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+        # Строка файла обновляется до проверки наличия файла и держит
+        # блокировку до конца транзакции, поэтому сборка мусора не
+        # удалит файл между проверкой и сохранением ссылки на него.
+        with transaction.atomic():
+            apps.get_model('recipes', 'MediaFile').objects.update_or_create(
+                name=name,
+                defaults={'size': content.size, 'last_used': timezone.now()}
+            )
+            if not self.exists(name):
+                super().save(name, content, max_length)
+        return name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def unreferenced_files(used_before: datetime) -> QuerySet:
+    """Файлы хранилища, на которые не ссылается ни одна запись.
+
+    Ссылки ищутся во всех файловых полях моделей, которые
+    используют content_storage.
+    """
+    MediaFile = apps.get_model('recipes', 'MediaFile')
+    files = MediaFile.objects.filter(last_used__lt=used_before)
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if (
+                isinstance(field, FileField)
+                and field.storage is content_storage
+            ):
+                files = files.exclude(Exists(
+                    model._base_manager.filter(
+                        **{field.name: OuterRef('name')}
+                    )
+                ))
+    return files
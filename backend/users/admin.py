@@ -29,12 +29,11 @@ class CustomUserAdmin(admin.ModelAdmin):
         }),
     )
 
-    @admin.display(description='Подписчики')
-    def is_subscribing(self, obj: Subscription) -> bool:
+    @admin.display(description='Подписчики', ordering='subscribers_count')
+    def is_subscribing(self, obj: CustomUser) -> bool:
         """Счетчик подписчиков."""
-        count = obj.subscribing.count()
-        if count > 0:
-            return f'{count} ❤️'
+        if obj.subscribers_count > 0:
+            return f'{obj.subscribers_count} ❤️'
 
 
 @admin.register(Subscription)
@@ -35,6 +35,16 @@ class CustomUser(AbstractUser):
         validators=[validate_password],
         verbose_name='Пароль',
     )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчики',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецепты',
+    )
 
     class Meta:
         verbose_name = 'Пользователь'